@@ -1,8 +1,16 @@
+import asyncio
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 
 from src.routes.routes import router
 from src.services.classification_srv import ClassificationModel
+from src.services.batching_srv import InferenceBatcher
+from src.services.executor_srv import InferenceExecutor
+from src.services.result_cache import ResultCache
+from src.services.nutrition_cache import NutritionCache
+from src.services.nutrition_table import NutritionTable
+from src.services import nutrition_srv
+from src.middleware.upload_limit import UploadLimitMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 import config
 
@@ -16,11 +24,45 @@ async def lifespan(app: FastAPI):
   """
 
   try:
-    # init the model
-    ClassificationModel.get_instance()
-    print('Model initialized successfully')
+    # init the model, worker processes of a process pool load their own copy instead
+    if CONFIG.INFERENCE_EXECUTOR != 'process':
+      ClassificationModel.get_instance()
+      print('Model initialized successfully')
+
+    # keep decode, preprocessing and the forward pass off the event loop
+    InferenceExecutor.get_instance().start()
+
+    # the first forward passes are slow (allocations, kernel selection, compilation),
+    # run them before the app reports ready instead of on the first requests
+    await InferenceExecutor.get_instance().warmup(CONFIG.WARMUP_ITERATIONS)
+
+    # cached results are keyed on the weights the model was loaded from
+    ResultCache.get_instance().set_model_version(await InferenceExecutor.get_instance().model_version())
+
+    # start collecting concurrent single image requests into batches
+    if CONFIG.BATCHING_ENABLED:
+      await InferenceBatcher.get_instance().start()
+
+    warmup = None
+    if CONFIG.NUTRITION_SOURCE == 'table':
+      # serve nutrition from the offline table, fails here if the table is missing
+      print(f'Nutrition table loaded with {len(NutritionTable.get_instance())} labels')
+    else:
+      # one pooled http client for all calls to the nutrition API
+      nutrition_srv.init_client()
+
+      # fill the nutrition cache in the background, requests can be served meanwhile
+      if CONFIG.NUTRITION_CACHE_WARMUP:
+        warmup = asyncio.create_task(nutrition_srv.warm_cache(CONFIG.LABEL_PATH))
 
     yield  # yield = wait for the app to finish
+
+    await InferenceBatcher.get_instance().stop()
+    InferenceExecutor.get_instance().stop()
+    if warmup is not None:
+      warmup.cancel()
+    await nutrition_srv.close_client()
+    NutritionCache.get_instance().close()
   except Exception as e:
     print(f'Error during initialization: {e}')
     raise e
@@ -30,6 +72,13 @@ app = FastAPI(lifespan=lifespan)
 
 CONFIG = config.get_config()
 
+# reject oversized uploads while they are streamed in, before they are buffered
+app.add_middleware(
+  UploadLimitMiddleware,
+  max_bytes=CONFIG.MAX_UPLOAD_BYTES,
+  path_limits={'/api/classify/batch': CONFIG.MAX_BATCH_UPLOAD_BYTES},
+)
+
 # enable CORS
 app.add_middleware(
   CORSMiddleware,
@@ -0,0 +1,89 @@
+"""Per-image preprocessing time of the old and the new decode path.
+
+Run from the backend directory:
+    python -m benchmarks.bench_preprocess
+"""
+
+import time
+import argparse
+import statistics
+import torch
+import numpy as np
+from io import BytesIO
+from PIL import Image
+from torchvision import transforms
+
+from src.services.preprocessing import decode_image, to_normalized_tensor
+
+# (name, width, height) of the synthetic test images
+SIZES = [
+  ('thumbnail', 320, 240),
+  ('1mp', 1280, 960),
+  ('3mp', 2048, 1536),
+  ('12mp', 4032, 3024),
+]
+
+IMAGE_SIZE = 224
+MAX_PIXELS = 50_000_000
+
+# the preprocessing that was used before the fast decode path
+legacy_transform = transforms.Compose(
+  [
+    transforms.Resize((IMAGE_SIZE, IMAGE_SIZE)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+  ]
+)
+
+
+def make_jpeg(width: int, height: int) -> bytes:
+  """Create a JPEG with smooth gradients and some noise, similar in size to a photo."""
+  x = np.linspace(0, 255, width, dtype=np.float32)
+  y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+  noise = np.random.default_rng(0).normal(0, 12, (height, width)).astype(np.float32)
+  channels = [x + 0 * y + noise, y + 0 * x + noise, (x + y) / 2 + noise]
+  pixels = np.clip(np.stack(channels, axis=-1), 0, 255).astype(np.uint8)
+
+  buffer = BytesIO()
+  Image.fromarray(pixels).save(buffer, format='JPEG', quality=90)
+  return buffer.getvalue()
+
+
+def legacy_preprocess(image_bytes: bytes) -> torch.Tensor:
+  image = Image.open(BytesIO(image_bytes)).convert('RGB')
+  return legacy_transform(image)
+
+
+def fast_preprocess(image_bytes: bytes) -> torch.Tensor:
+  image = decode_image(image_bytes, IMAGE_SIZE, MAX_PIXELS)
+  return to_normalized_tensor(image, IMAGE_SIZE)
+
+
+def time_ms(fn, image_bytes: bytes, repeats: int) -> float:
+  """Median wall time of fn in milliseconds."""
+  fn(image_bytes)  # warm-up
+  timings = []
+  for _ in range(repeats):
+    start = time.perf_counter()
+    fn(image_bytes)
+    timings.append((time.perf_counter() - start) * 1000)
+  return statistics.median(timings)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--repeats', type=int, default=20)
+  args = parser.parse_args()
+
+  torch.set_num_threads(1)
+  print(f'{"image":<10} {"pixels":>12} {"before ms":>10} {"after ms":>10} {"speedup":>8} {"max abs diff":>13}')
+  for name, width, height in SIZES:
+    image_bytes = make_jpeg(width, height)
+    before = time_ms(legacy_preprocess, image_bytes, args.repeats)
+    after = time_ms(fast_preprocess, image_bytes, args.repeats)
+    diff = (legacy_preprocess(image_bytes) - fast_preprocess(image_bytes)).abs().max().item()
+    print(f'{name:<10} {width * height:>12} {before:>10.2f} {after:>10.2f} {before / after:>7.1f}x {diff:>13.3f}')
+
+
+if __name__ == '__main__':
+  main()
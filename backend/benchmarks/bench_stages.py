@@ -0,0 +1,186 @@
+"""Time each stage of the classification hot path separately.
+
+The model is loaded from a temporary checkpoint with random weights, so no
+trained checkpoint is needed. The results are written as JSON with one entry
+per stage and parameter combination, and a previous result file can be passed
+to compare two commits.
+
+Run from the backend directory:
+    python -m benchmarks.bench_stages --output ../temp/bench_stages.json
+    python -m benchmarks.bench_stages --baseline ../temp/bench_stages_main.json
+"""
+
+import os
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import torch
+
+import config
+from benchmarks.bench_preprocess import SIZES, make_jpeg
+from src.services.model import FoodClassifier
+from src.services.classification_srv import ClassificationModel
+from src.services.nutrition_srv import _parse_nutrition_scores
+
+FOOD_ITEMS = {
+  'match': {
+    'food_description': 'Per 100g - Calories: 295kcal | Fat: 14.00g | Carbs: 24.00g | Protein: 17.00g',
+    'food_url': 'https://www.fatsecret.com/calories-nutrition/generic/hamburger',
+  },
+  'no_match': {
+    'food_description': 'Per 1 serving - nutrition facts are not available for this item',
+    'food_url': 'https://www.fatsecret.com/calories-nutrition/generic/unknown',
+  },
+}
+
+
+def random_model(weights_dir: str) -> ClassificationModel:
+  """Create the classification model through its constructor, loaded from a checkpoint with random weights.
+  Only the weights source is overridden, everything else is set up as in the backend.
+
+  Args:
+      weights_dir (str): directory to write the random checkpoint to.
+
+  Returns:
+      ClassificationModel: the eager fp32 model.
+  """
+  weights_path = os.path.join(weights_dir, 'random_weights.pth')
+  torch.save(FoodClassifier(num_classes=101).state_dict(), weights_path)
+
+  # the config reads the environment once at import, its class attributes are overridden for this process
+  overrides = {
+    'WEIGHTS_PATH': weights_path,
+    'WEIGHTS_LOADING_APPROACH': 'default',
+    'SHARED_WEIGHTS': False,
+    'MODEL_PRECISION': 'fp32',
+    'INFERENCE_BACKEND': 'eager',
+    'CASCADE_ENABLED': False,
+  }
+  for name, value in overrides.items():
+    setattr(config.Config, name, value)
+  return ClassificationModel()
+
+
+def measure(fn, repeats: int, min_time: float = 0.0) -> dict:
+  """Wall time statistics of fn in milliseconds.
+
+  Args:
+      fn (callable): the function to time, called without arguments.
+      repeats (int): minimum number of timed calls.
+      min_time (float): keep calling until this many seconds have passed, for very fast functions.
+
+  Returns:
+      dict: number of calls, median, p90, min and mean time per call.
+  """
+  fn()  # warm-up
+  timings = []
+  start = time.perf_counter()
+  while len(timings) < repeats or time.perf_counter() - start < min_time:
+    t = time.perf_counter()
+    fn()
+    timings.append((time.perf_counter() - t) * 1000)
+  timings.sort()
+  return {
+    'calls': len(timings),
+    'median_ms': round(statistics.median(timings), 4),
+    'p90_ms': round(timings[int(0.9 * (len(timings) - 1))], 4),
+    'min_ms': round(timings[0], 4),
+    'mean_ms': round(statistics.fmean(timings), 4),
+  }
+
+
+def bench_preprocessing(model: ClassificationModel, repeats: int) -> dict:
+  """Decode and decode + tensor conversion per image size, both are single threaded."""
+  results = {}
+  for name, width, height in SIZES:
+    image_bytes = make_jpeg(width, height)
+    results[f'process_image_bytes/size={name}'] = measure(lambda: model._process_image_bytes(image_bytes), repeats)
+    results[f'preprocess_image_for_resnet/size={name}'] = measure(
+      lambda: model._preprocess_image_for_resnet(image_bytes), repeats
+    )
+  return results
+
+
+def bench_predict(model: ClassificationModel, batch_sizes: list, thread_counts: list, repeats: int) -> dict:
+  """Forward pass, softmax and top-1 per batch size and number of intra-op threads."""
+  results = {}
+  generator = torch.Generator().manual_seed(0)
+  for threads in thread_counts:
+    torch.set_num_threads(threads)
+    for batch_size in batch_sizes:
+      input_tensor = torch.randn(batch_size, 3, model.image_size, model.image_size, generator=generator)
+      fn = (lambda: model._predict(input_tensor)) if batch_size == 1 else (lambda: model._predict_batch(input_tensor))
+      result = measure(fn, repeats)
+      result['images_per_s'] = round(batch_size / result['median_ms'] * 1000, 2)
+      results[f'predict/batch={batch_size}/threads={threads}'] = result
+  return results
+
+
+def bench_nutrition_parse(repeats: int) -> dict:
+  """Regex parse of the food description returned by the nutrition API."""
+  return {
+    f'parse_nutrition_scores/{name}': measure(lambda: _parse_nutrition_scores(item), repeats, min_time=0.2)
+    for name, item in FOOD_ITEMS.items()
+  }
+
+
+def compare(results: dict, baseline: dict):
+  """Print the median of every stage next to the baseline."""
+  print(f'{"benchmark":<48} {"baseline ms":>12} {"current ms":>12} {"change":>8}')
+  for key, result in results.items():
+    if key not in baseline:
+      continue
+    before, after = baseline[key]['median_ms'], result['median_ms']
+    print(f'{key:<48} {before:>12.4f} {after:>12.4f} {(after - before) / before:>+8.1%}')
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--repeats', type=int, default=20)
+  parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16])
+  parser.add_argument('--threads', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count()}))
+  parser.add_argument('--stages', nargs='+', default=['preprocess', 'predict', 'nutrition'])
+  parser.add_argument('--output', default=None, help='write the JSON results to this file')
+  parser.add_argument('--baseline', default=None, help='JSON results of an earlier run to compare with')
+  args = parser.parse_args()
+
+  torch.manual_seed(0)
+  results = {}
+  with tempfile.TemporaryDirectory() as weights_dir:
+    model = random_model(weights_dir)
+    # the constructor sets the thread budget of the backend, the stages are timed with explicit counts
+    torch.set_num_threads(1)
+    if 'preprocess' in args.stages:
+      results.update(bench_preprocessing(model, args.repeats))
+    if 'predict' in args.stages:
+      results.update(bench_predict(model, args.batch_sizes, args.threads, args.repeats))
+  if 'nutrition' in args.stages:
+    results.update(bench_nutrition_parse(args.repeats))
+
+  report = {
+    'environment': {
+      'python': platform.python_version(),
+      'torch': torch.__version__,
+      'machine': platform.machine(),
+      'cpu_count': os.cpu_count(),
+    },
+    'results': results,
+  }
+  text = json.dumps(report, indent=2, sort_keys=True)
+  if args.output:
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+      f.write(text + '\n')
+  else:
+    print(text)
+
+  if args.baseline:
+    with open(args.baseline, 'r') as f:
+      compare(results, json.load(f)['results'])
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,97 @@
+"""Build the offline nutrition table for all labels of the model.
+
+Resolves the nutrition scores of every label once with the nutrition API and writes them
+to a JSON table in src/static_files. With NUTRITION_SOURCE='table' the backend serves
+nutrition only from this table, without any calls to the nutrition API. Running this
+script again (or `dvc repro -f nutrition_table`) is the explicit refresh of the table.
+Labels that fail keep the scores of the previous table, if there is one.
+
+Needs CLIENT_ID, CLIENT_SECRET and NUTRITION_API_URL. Run from the backend directory:
+    python build_nutrition_table.py
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+from datetime import datetime, timezone
+
+import config
+from src.services import nutrition_srv
+from src.services.nutrition_table import load_table
+
+CONFIG = config.get_config()
+
+
+async def fetch_all(labels: list[str], concurrency: int, retries: int) -> dict:
+  """Fetch the nutrition scores of all labels from the nutrition API.
+
+  Args:
+      labels (list[str]): the labels of the model.
+      concurrency (int): maximum number of concurrent calls.
+      retries (int): attempts per label before it is given up.
+
+  Returns:
+      dict: the nutrition scores of every label that could be fetched.
+  """
+  semaphore = asyncio.Semaphore(concurrency)
+
+  async def fetch(label: str):
+    async with semaphore:
+      for attempt in range(1, retries + 1):
+        try:
+          return label, await nutrition_srv._fetch_nutrition_scores(label)
+        except Exception as e:
+          print(f'{label}: attempt {attempt} failed: {e}')
+          await asyncio.sleep(attempt)
+      return label, None
+
+  try:
+    results = await asyncio.gather(*[fetch(label) for label in labels])
+  finally:
+    await nutrition_srv.close_client()
+  return {label: scores for label, scores in results if scores is not None}
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--labels', default=CONFIG.LABEL_PATH)
+  parser.add_argument('--output', default=CONFIG.NUTRITION_TABLE_PATH)
+  parser.add_argument('--concurrency', type=int, default=CONFIG.NUTRITION_CACHE_WARMUP_CONCURRENCY)
+  parser.add_argument('--retries', type=int, default=3)
+  args = parser.parse_args()
+
+  with open(args.labels, 'r') as f:
+    labels = json.load(f)
+
+  previous = load_table(args.output)['nutrition'] if os.path.exists(args.output) else {}
+  fetched = asyncio.run(fetch_all(labels, args.concurrency, args.retries))
+
+  nutrition = {}
+  for label in labels:
+    if label in fetched:
+      nutrition[label] = fetched[label]
+    elif label in previous:
+      print(f'{label}: keeping the previous scores')
+      nutrition[label] = previous[label]
+
+  table = {
+    'built_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    'source': CONFIG.NUTRITION_API_URL,
+    'nutrition': nutrition,
+  }
+  tmp_path = f'{args.output}.tmp'
+  with open(tmp_path, 'w') as f:
+    json.dump(table, f, indent=2, sort_keys=True)
+  os.replace(tmp_path, args.output)
+
+  missing = [label for label in labels if label not in nutrition]
+  print(f'Nutrition table with {len(nutrition)}/{len(labels)} labels saved to: {args.output}')
+  if missing:
+    print(f'Missing labels: {", ".join(missing)}')
+  sys.exit(1 if missing else 0)
+
+
+if __name__ == '__main__':
+  main()
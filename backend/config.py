@@ -9,12 +9,98 @@ class Config:
   CLIENT_ID = os.getenv('CLIENT_ID')
   CLIENT_SECRET = os.getenv('CLIENT_SECRET')
   NUTRITION_API_URL = os.getenv('NUTRITION_API_URL')
+
+  # 'table' serves nutrition only from the offline table built by build_nutrition_table.py (no network calls)
+  NUTRITION_SOURCE = os.getenv('NUTRITION_SOURCE', 'api')  # 'api' or 'table'
+  NUTRITION_TABLE_PATH = os.getenv('NUTRITION_TABLE_PATH', './src/static_files/nutrition_table.json')
+
+  # http client for the nutrition API (shared connection pool)
+  NUTRITION_HTTP2 = os.getenv('NUTRITION_HTTP2', 'false').lower() == 'true'
+  NUTRITION_CONNECT_TIMEOUT_S = float(os.getenv('NUTRITION_CONNECT_TIMEOUT_S', '2'))
+  NUTRITION_READ_TIMEOUT_S = float(os.getenv('NUTRITION_READ_TIMEOUT_S', '5'))
+  NUTRITION_MAX_CONNECTIONS = int(os.getenv('NUTRITION_MAX_CONNECTIONS', '20'))
+  NUTRITION_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('NUTRITION_MAX_KEEPALIVE_CONNECTIONS', '10'))
+  NUTRITION_KEEPALIVE_EXPIRY_S = float(os.getenv('NUTRITION_KEEPALIVE_EXPIRY_S', '30'))
   
+  # nutrition cache (in-memory LRU with TTL, optionally persisted to a SQLite file)
+  NUTRITION_CACHE_SIZE = int(os.getenv('NUTRITION_CACHE_SIZE', '512'))
+  NUTRITION_CACHE_TTL_S = float(os.getenv('NUTRITION_CACHE_TTL_S', str(7 * 24 * 3600)))
+  NUTRITION_CACHE_PATH = os.getenv('NUTRITION_CACHE_PATH', '')  # empty = memory only
+  NUTRITION_CACHE_WARMUP = os.getenv('NUTRITION_CACHE_WARMUP', 'true').lower() == 'true'
+  NUTRITION_CACHE_WARMUP_CONCURRENCY = int(os.getenv('NUTRITION_CACHE_WARMUP_CONCURRENCY', '8'))
+  # expired entries are still served for this long while they are refreshed in the background
+  NUTRITION_CACHE_STALE_S = float(os.getenv('NUTRITION_CACHE_STALE_S', str(30 * 24 * 3600)))
+
+  # latency budget of the nutrition lookups per request, the classification is returned without
+  # nutrition when it runs out, and the circuit breaker stops calling a failing nutrition API
+  NUTRITION_DEADLINE_S = float(os.getenv('NUTRITION_DEADLINE_S', '2'))
+  NUTRITION_BREAKER_FAILURES = int(os.getenv('NUTRITION_BREAKER_FAILURES', '5'))  # 0 = disabled
+  NUTRITION_BREAKER_RESET_S = float(os.getenv('NUTRITION_BREAKER_RESET_S', '30'))
+
   # model config (weights, labels, loading approach)
   CHECKPOINT_PATH = os.getenv('CHECKPOINT_PATH', './src/static_files/model.ckpt')
   WEIGHTS_PATH = os.getenv('WEIGHTS_PATH', './src/static_files/food_classifier_weights.pth')
   LABEL_PATH = os.getenv('LABEL_PATH', './src/static_files/labels.json')
   WEIGHTS_LOADING_APPROACH = os.getenv('WEIGHTS_LOADING_APPROACH', 'wandb')  # 'default' or 'wandb'
+  # inference runtime, the torchscript and onnx files are created by export.py
+  INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'eager')  # 'eager', 'torchscript', 'compile' or 'onnx'
+  TORCHSCRIPT_MODEL_PATH = os.getenv('TORCHSCRIPT_MODEL_PATH', './src/static_files/food_classifier.torchscript.pt')
+  ONNX_MODEL_PATH = os.getenv('ONNX_MODEL_PATH', './src/static_files/food_classifier.onnx')
+  # 'int8' loads the quantized TorchScript model created by src/quantize.py (CPU only)
+  MODEL_PRECISION = os.getenv('MODEL_PRECISION', 'fp32')  # 'fp32' or 'int8'
+  QUANTIZED_MODEL_PATH = os.getenv('QUANTIZED_MODEL_PATH', './src/static_files/food_classifier_int8.pt')
+
+  # cascade: a small model (e.g. finetuned with model.arch: mobilenet_v3_large in config.yaml) runs first,
+  # images below the confidence threshold are escalated to the model above
+  CASCADE_ENABLED = os.getenv('CASCADE_ENABLED', 'false').lower() == 'true'
+  CASCADE_ARCH = os.getenv('CASCADE_ARCH', 'mobilenet_v3_large')
+  CASCADE_CHECKPOINT_PATH = os.getenv('CASCADE_CHECKPOINT_PATH', './src/static_files/cascade_model.ckpt')
+  CASCADE_THRESHOLD = float(os.getenv('CASCADE_THRESHOLD', '0.8'))
+
+  # forward passes run on startup, before the app reports ready
+  WARMUP_ITERATIONS = int(os.getenv('WARMUP_ITERATIONS', '3'))
+
+  # uploads with more pixels are rejected before they are decoded
+  MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', str(50_000_000)))
+
+  # admission control, request bodies above the limit are rejected while they are uploaded (413),
+  # and inferences above the in-flight limit wait in a bounded queue or are shed (503 with Retry-After)
+  MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))  # 0 = no limit
+  MAX_BATCH_UPLOAD_BYTES = int(os.getenv('MAX_BATCH_UPLOAD_BYTES', str(100 * 1024 * 1024)))
+  MAX_IN_FLIGHT_INFERENCES = int(os.getenv('MAX_IN_FLIGHT_INFERENCES', '16'))  # 0 = no limit
+  ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', '32'))
+  ADMISSION_QUEUE_TIMEOUT_S = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_S', '5'))
+  RETRY_AFTER_S = int(os.getenv('RETRY_AFTER_S', '1'))
+
+  # results of repeated uploads (same bytes, same model weights) are served from memory
+  RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '1024'))
+
+  # number of most likely classes returned per image, the alternatives are sent with their nutrition.
+  # their lookups start after the forward pass together with the one of the most likely class
+  PREDICTION_TOP_K = int(os.getenv('PREDICTION_TOP_K', '1'))
+
+  # serving with several uvicorn workers (see serve.py)
+  HOST = os.getenv('HOST', '0.0.0.0')
+  PORT = int(os.getenv('PORT', '8000'))
+  WORKERS = int(os.getenv('WORKERS', '1'))
+  # intra-op threads per forward pass, 0 = divide the cores between all inference workers of all processes
+  TORCH_NUM_THREADS = int(os.getenv('TORCH_NUM_THREADS', '0'))
+  # memory-map one copy of the weights that all workers share (eager and compile backends)
+  SHARED_WEIGHTS = os.getenv('SHARED_WEIGHTS', 'false').lower() == 'true'
+  SHARED_WEIGHTS_PATH = os.getenv('SHARED_WEIGHTS_PATH', './src/static_files/food_classifier_shared.pt')
+
+  # executor that runs decode, preprocessing and the forward pass off the event loop
+  INFERENCE_EXECUTOR = os.getenv('INFERENCE_EXECUTOR', 'thread')  # 'thread' or 'process'
+  INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '2'))
+  INFERENCE_QUEUE_SIZE = int(os.getenv('INFERENCE_QUEUE_SIZE', '32'))  # jobs beyond it are rejected (503)
+  # decoding and preprocessing run in their own threads, so forward passes do not queue behind them
+  PREPROCESS_WORKERS = int(os.getenv('PREPROCESS_WORKERS', '2'))
+
+  # dynamic micro-batching of concurrent /api/classify requests,
+  # /api/classify/batch runs its images in chunks of BATCH_MAX_SIZE without waiting
+  BATCHING_ENABLED = os.getenv('BATCHING_ENABLED', 'true').lower() == 'true'
+  BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', '8'))
+  BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', '5'))
 
 
 class ProdConfig(Config):
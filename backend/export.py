@@ -0,0 +1,78 @@
+"""Export the trained model for the torchscript and onnx inference backends.
+
+Loads the Lightning checkpoint created by src/train.py (or a plain state dict), writes one
+file per format and checks that its outputs match the eager model within a tolerance.
+'compile' has no artifact, it is only checked for parity.
+
+Run from the backend directory:
+    python export.py --format torchscript onnx
+"""
+
+import sys
+import argparse
+import torch
+
+import config
+from src.services.model import FoodClassifier
+from src.services.shared_weights import load_state_dict_file
+from src.services.inference_backends import (
+  EagerBackend,
+  CompileBackend,
+  TorchScriptBackend,
+  OnnxBackend,
+  export_torchscript,
+  export_onnx,
+  max_abs_difference,
+)
+
+CONFIG = config.get_config()
+
+
+def load_checkpoint(path: str, num_classes: int) -> FoodClassifier:
+  """Load a Lightning checkpoint or a plain state dict into the FoodClassifier.
+
+  Args:
+      path (str): path of the .ckpt, .pth or .safetensors file.
+      num_classes (int): number of output classes.
+
+  Returns:
+      FoodClassifier: the model in eval mode on the cpu.
+  """
+  model = FoodClassifier(num_classes=num_classes)
+  model.load_state_dict(load_state_dict_file(path))
+  return model.eval()
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--checkpoint', default=CONFIG.CHECKPOINT_PATH)
+  parser.add_argument('--format', nargs='+', choices=['torchscript', 'onnx', 'compile'], default=['torchscript', 'onnx'])
+  parser.add_argument('--torchscript-path', default=CONFIG.TORCHSCRIPT_MODEL_PATH)
+  parser.add_argument('--onnx-path', default=CONFIG.ONNX_MODEL_PATH)
+  parser.add_argument('--tolerance', type=float, default=1e-3, help='maximum absolute difference of the logits')
+  args = parser.parse_args()
+
+  model = load_checkpoint(args.checkpoint, num_classes=101)
+  eager = EagerBackend(model)
+
+  failed = False
+  for fmt in args.format:
+    if fmt == 'torchscript':
+      export_torchscript(model, args.torchscript_path)
+      backend = TorchScriptBackend(args.torchscript_path, torch.device('cpu'))
+    elif fmt == 'onnx':
+      export_onnx(model, args.onnx_path)
+      backend = OnnxBackend(args.onnx_path)
+    else:
+      backend = CompileBackend(model)
+
+    diff = max_abs_difference(eager, backend)
+    ok = diff <= args.tolerance
+    failed = failed or not ok
+    print(f'{fmt:<12} max abs diff {diff:.2e} {"ok" if ok else "FAILED"}')
+
+  sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+  main()
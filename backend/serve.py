@@ -0,0 +1,24 @@
+"""Start the backend with several uvicorn workers.
+
+The workers memory-map one shared copy of the model weights (SHARED_WEIGHTS=true) and
+divide the cores between them (TORCH_NUM_THREADS=0), see config.py.
+
+Run from the backend directory:
+    WORKERS=4 SHARED_WEIGHTS=true python serve.py
+"""
+
+import uvicorn
+
+import config
+from src.services.classification_srv import ClassificationModel
+from src.services.shared_weights import prepare_shared_weights
+
+CONFIG = config.get_config()
+
+
+if __name__ == '__main__':
+  # write the shared weights once before the workers start, instead of every worker racing to do it
+  if CONFIG.SHARED_WEIGHTS and CONFIG.MODEL_PRECISION == 'fp32' and CONFIG.INFERENCE_BACKEND in ('eager', 'compile'):
+    prepare_shared_weights(ClassificationModel.get_weights_path(), CONFIG.SHARED_WEIGHTS_PATH)
+
+  uvicorn.run('app:app', host=CONFIG.HOST, port=CONFIG.PORT, workers=CONFIG.WORKERS)
@@ -1,9 +1,20 @@
+import json
+import asyncio
 import logging
-from typing import Dict
+import torch
+from typing import AsyncIterator, Dict, Optional
 from fastapi import HTTPException
 
-from src.services.classification_srv import ClassificationModel
+import config
+from src.services.executor_srv import InferenceExecutor
+from src.services.batching_srv import InferenceBatcher
+from src.services.result_cache import ResultCache
+from src.services.admission_srv import AdmissionController, Overloaded
 from src.services import nutrition_srv
+from src.services.metrics_srv import ERRORS, NUTRITION_STATUS
+
+
+CONFIG = config.get_config()
 
 
 async def classify(image_bytes: bytes) -> Dict:
@@ -14,20 +25,241 @@ async def classify(image_bytes: bytes) -> Dict:
 
   Returns:
       Dict: the classification result, probablity and nutrition scores.
+      With PREDICTION_TOP_K > 1 the other likely classes are returned as alternatives.
+      The nutrition_status is 'ok', 'stale', 'timeout' or 'unavailable', the nutrition
+      is None when the scores could not be fetched within the deadline.
   """
 
   try:
-    # get classifications
-    model = ClassificationModel.get_instance()
-
-    # get the classification result
-    label, probability = model.inference(image_bytes)
+    return await _classify_cached(image_bytes, use_batcher=CONFIG.BATCHING_ENABLED)
 
-    # get nutrition scores based on the classification result
-    scores = await nutrition_srv.get_nutrition_scores(label)
-
-    return {'label': label, 'probability': round(probability, 3), 'nutrition': scores}
+  except Overloaded as e:
+    # shed requests are not errors of the request, the client should come back later
+    raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': str(e.retry_after)})
 
   except Exception as e:
     logging.exception(f'Error classifying food: {e}')
+    ERRORS.labels('classify').inc()
     raise HTTPException(status_code=400, detail='Error in classify function')
+
+
+async def classify_batch(images: list[tuple[str, bytes]]) -> AsyncIterator[str]:
+  """Classify many images and stream one NDJSON line per image as soon as its chunk is done.
+  The batch request takes one admission slot for all its images. They are split into chunks
+  of BATCH_MAX_SIZE images, each chunk is run through the model in one forward pass and at
+  most as many chunks run at a time as there are inference workers.
+
+  Args:
+      images (list[tuple[str, bytes]]): filename and bytes of each image.
+
+  Returns:
+      AsyncIterator[str]: the json encoded result of each image, followed by a newline.
+  """
+
+  admission = AdmissionController.get_instance()
+  try:
+    await admission.acquire()
+  except Overloaded as e:
+    raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': str(e.retry_after)})
+
+  chunk_size = max(1, CONFIG.BATCH_MAX_SIZE)
+  indexed = [(i, filename, image_bytes) for i, (filename, image_bytes) in enumerate(images)]
+  running = asyncio.Semaphore(InferenceExecutor.get_instance().max_workers)
+
+  async def classify_chunk(chunk: list[tuple[int, str, bytes]]) -> list[Dict]:
+    async with running:
+      return await _classify_chunk(chunk)
+
+  tasks = [asyncio.create_task(classify_chunk(indexed[i:i + chunk_size])) for i in range(0, len(indexed), chunk_size)]
+  # the slot is released when all chunks are done, also if the response is never streamed
+  asyncio.gather(*tasks, return_exceptions=True).add_done_callback(lambda _: admission.release())
+  return _stream_results(tasks)
+
+
+async def _classify_chunk(chunk: list[tuple[int, str, bytes]]) -> list[Dict]:
+  """Classify the images of one chunk of a batch request with a single forward pass.
+  Cached images are answered from the result cache, errors are reported inline, so
+  one broken image does not fail the rest of the batch.
+
+  Args:
+      chunk (list[tuple[int, str, bytes]]): index in the batch, filename and bytes of each image.
+
+  Returns:
+      list[Dict]: the result of each image with its index and filename.
+  """
+
+  cache = ResultCache.get_instance()
+  executor = InferenceExecutor.get_instance()
+
+  results, misses = {}, []
+  for index, _, image_bytes in chunk:
+    key = cache.key(image_bytes)
+    result = cache.get(key)
+    if result is not None:
+      results[index] = result
+    else:
+      misses.append((index, key, image_bytes))
+
+  tensors = await asyncio.gather(*[executor.preprocess(image_bytes) for _, _, image_bytes in misses], return_exceptions=True)
+  decoded = []
+  for (index, key, _), tensor in zip(misses, tensors):
+    if isinstance(tensor, Exception):
+      results[index] = _batch_error(tensor, 'Invalid image')
+    else:
+      decoded.append((index, key, tensor))
+
+  if decoded:
+    try:
+      predictions = await executor.predict_batch(torch.cat([tensor for _, _, tensor in decoded]))
+    except Exception as e:
+      for index, _, _ in decoded:
+        results[index] = _batch_error(e, 'Error in classify function')
+    else:
+      outputs = await asyncio.gather(*[_with_nutrition(image_predictions) for image_predictions in predictions])
+      for (index, key, _), result in zip(decoded, outputs):
+        _cache_result(cache, key, result)
+        results[index] = result
+
+  return [{'index': index, 'filename': filename, **results[index]} for index, filename, _ in chunk]
+
+
+def _batch_error(error: Exception, message: str) -> Dict:
+  """Log a failed image of a batch request and build its inline error.
+
+  Args:
+      error (Exception): the error of the image.
+      message (str): the message returned to the client, the error itself is only logged.
+
+  Returns:
+      Dict: the error of the image.
+  """
+  ERRORS.labels('classify_batch').inc()
+  if isinstance(error, Overloaded):
+    # shed images are not broken, the client can send them again later
+    return {'error': str(error)}
+  logging.error(f'Error classifying food in batch: {error}', exc_info=error)
+  return {'error': message}
+
+
+async def _stream_results(tasks: list[asyncio.Task]) -> AsyncIterator[str]:
+  """Yield the results of the batch in the order the chunks finish.
+
+  Args:
+      tasks (list[asyncio.Task]): the classification task of each chunk.
+
+  Yields:
+      str: the json encoded result of one image, followed by a newline.
+  """
+  try:
+    for task in asyncio.as_completed(tasks):
+      for result in await task:
+        yield json.dumps(result) + '\n'
+  finally:
+    # the client may disconnect before all results are streamed
+    for task in tasks:
+      task.cancel()
+
+
+async def _classify_cached(image_bytes: bytes, use_batcher: bool) -> Dict:
+  """Classify an image, answering repeated uploads of the same bytes from the result cache.
+
+  Args:
+      image_bytes (bytes): bytes of the image.
+      use_batcher (bool): batch the forward pass together with concurrent requests.
+
+  Returns:
+      Dict: the classification result, probablity and nutrition scores.
+  """
+
+  cache = ResultCache.get_instance()
+  key = cache.key(image_bytes)
+  result = cache.get(key)
+  if result is not None:
+    return result
+
+  # get the classification result, batched together with concurrent requests if enabled.
+  # only cache misses need an inference slot, cached results are served under overload too
+  async with AdmissionController.get_instance().admit():
+    if use_batcher:
+      predictions = await InferenceBatcher.get_instance().submit(image_bytes)
+    else:
+      predictions = await InferenceExecutor.get_instance().inference(image_bytes)
+
+  result = await _with_nutrition(predictions)
+  _cache_result(cache, key, result)
+  return result
+
+
+def _cache_result(cache: ResultCache, key: str, result: Dict):
+  """Cache a classification result unless its nutrition is degraded.
+
+  Args:
+      cache (ResultCache): the result cache.
+      key (str): the cache key of the image.
+      result (Dict): the classification result.
+  """
+  # degraded results are not cached, so the nutrition is filled in on the next upload
+  statuses = [result['nutrition_status']] + [alt['nutrition_status'] for alt in result.get('alternatives', [])]
+  if all(status == 'ok' for status in statuses):
+    cache.set(key, result)
+
+
+async def _with_nutrition(predictions: list[tuple[str, float]]) -> Dict:
+  """Fetch the nutrition scores for the predicted classes and build the response.
+  The labels are only known after the forward pass, so the lookups start once it is done,
+  they do not overlap with the inference. The lookups share one latency budget, classes
+  whose nutrition is not available in time are returned without it instead of failing the request.
+
+  Args:
+      predictions (list[tuple[str, float]]): the top-k class labels and probabilities, most likely first.
+
+  Returns:
+      Dict: the classification result, probablity, nutrition scores and nutrition status.
+  """
+
+  # with PREDICTION_TOP_K > 1 the lookups of the alternatives run concurrently with the one of
+  # the most likely class, so they do not add waiting time on top of it (k = 1 makes a single lookup)
+  lookups = [asyncio.ensure_future(nutrition_srv.lookup_nutrition_scores(label)) for label, _ in predictions]
+  await asyncio.wait(lookups, timeout=CONFIG.NUTRITION_DEADLINE_S or None)
+
+  results = []
+  for (label, probability), lookup in zip(predictions, lookups):
+    scores, status = _nutrition_outcome(label, lookup)
+    results.append({'label': label, 'probability': round(probability, 3), 'nutrition': scores, 'nutrition_status': status})
+
+  result = results[0]
+  NUTRITION_STATUS.labels(result['nutrition_status']).inc()
+  if len(results) > 1:
+    result['alternatives'] = results[1:]
+  return result
+
+
+def _nutrition_outcome(label: str, lookup: asyncio.Future) -> tuple[Optional[Dict], str]:
+  """Get the nutrition scores and status of a lookup after the deadline.
+
+  Args:
+      label (str): the class label of the lookup.
+      lookup (asyncio.Future): the nutrition lookup.
+
+  Returns:
+      tuple[Optional[Dict], str]: the nutrition scores (None if not available) and the nutrition status.
+  """
+
+  if not lookup.done():
+    # the lookup keeps running and fills the nutrition cache for the next request
+    lookup.add_done_callback(_discard_result)
+    logging.warning(f'Nutrition lookup for {label} exceeded the deadline')
+    return None, 'timeout'
+  if lookup.cancelled():
+    # e.g. the http client is closed at shutdown
+    return None, 'unavailable'
+  if lookup.exception() is not None:
+    logging.warning(f'Nutrition lookup for {label} failed: {lookup.exception()}')
+    return None, 'unavailable'
+  return lookup.result()
+
+
+def _discard_result(lookup: asyncio.Future):
+  # retrieve the exception of a late lookup, nobody is waiting for it anymore
+  if not lookup.cancelled():
+    lookup.exception()
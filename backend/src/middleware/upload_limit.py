@@ -0,0 +1,75 @@
+import json
+
+from src.services.metrics_srv import REQUESTS_SHED
+
+
+class UploadTooLarge(Exception):
+  """Raised into the app when the request body grows past the limit."""
+
+
+class UploadLimitMiddleware:
+  def __init__(self, app, max_bytes: int, path_limits: dict = None):
+    """Reject request bodies above a size limit while they are streamed in.
+    Requests announcing a larger Content-Length are answered before any of the body is
+    read, chunked uploads are cut off as soon as the limit is passed, so an upload never
+    has to be buffered completely to find out that it is too large.
+
+    Args:
+        app: the ASGI app.
+        max_bytes (int): maximum request body size, 0 disables the limit.
+        path_limits (dict): maximum body size for specific paths, instead of max_bytes.
+    """
+    self.app = app
+    self.max_bytes = max_bytes
+    self.path_limits = path_limits or {}
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] != 'http':
+      return await self.app(scope, receive, send)
+
+    limit = self.path_limits.get(scope['path'], self.max_bytes)
+    if limit <= 0:
+      return await self.app(scope, receive, send)
+
+    content_length = dict(scope['headers']).get(b'content-length')
+    if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+      return await self._reject(send, limit)
+
+    received = 0
+    exceeded = False
+    response_started = False
+
+    async def limited_receive():
+      nonlocal received, exceeded
+      message = await receive()
+      if message['type'] == 'http.request':
+        received += len(message.get('body', b''))
+        if received > limit:
+          exceeded = True
+          raise UploadTooLarge()
+      return message
+
+    async def guarded_send(message):
+      nonlocal response_started
+      # the app answers the aborted body with its own error, it is replaced by the 413
+      if exceeded:
+        return
+      response_started = True
+      await send(message)
+
+    try:
+      await self.app(scope, limited_receive, guarded_send)
+    except UploadTooLarge:
+      pass
+    if exceeded and not response_started:
+      await self._reject(send, limit)
+
+  async def _reject(self, send, limit: int):
+    REQUESTS_SHED.labels('upload_too_large').inc()
+    body = json.dumps({'detail': f'Upload larger than {limit} bytes'}).encode()
+    await send({
+      'type': 'http.response.start',
+      'status': 413,
+      'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
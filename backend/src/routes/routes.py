@@ -1,6 +1,18 @@
+import time
+from typing import AsyncIterator
 from fastapi import APIRouter, File, UploadFile
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST
 
 from src.controllers import main_ctrl
+from src.services.result_cache import ResultCache
+from src.services import metrics_srv
+from src.services.metrics_srv import STAGE_DURATION, IN_FLIGHT
+
+UPLOAD_READ_DURATION = STAGE_DURATION.labels('upload_read')
+# a batch takes much longer than one image, it gets its own duration instead of skewing the request one
+BATCH_REQUEST_DURATION = STAGE_DURATION.labels('batch_request')
+BATCH_IN_FLIGHT = IN_FLIGHT.labels('classify_batch')
 
 # instantiate the router
 router = APIRouter()
@@ -17,8 +29,41 @@ async def status():
   return {'msg': 'ok!'}
 
 
+@router.get('/api/cache')
+async def cache_stats():
+  return ResultCache.get_instance().stats()
+
+
+@router.get('/api/metrics')
+async def metrics():
+  return Response(metrics_srv.render(), media_type=CONTENT_TYPE_LATEST)
+
+
 # classification routes
 @router.post('/api/classify')
 async def classify(image: UploadFile = File(...)):
-  image_bytes = await image.read()
-  return await main_ctrl.classify(image_bytes)
+  with IN_FLIGHT.labels('classify').track_inprogress(), STAGE_DURATION.labels('request').time():
+    with UPLOAD_READ_DURATION.time():
+      image_bytes = await image.read()
+    return await main_ctrl.classify(image_bytes)
+
+
+@router.post('/api/classify/batch')
+async def classify_batch(images: list[UploadFile] = File(...)):
+  start = time.perf_counter()
+  with BATCH_IN_FLIGHT.track_inprogress():
+    # read all uploads before streaming, the files are closed once the response starts
+    with UPLOAD_READ_DURATION.time():
+      images = [(image.filename, await image.read()) for image in images]
+  results = await main_ctrl.classify_batch(images)
+  return StreamingResponse(_track_batch(results, start), media_type='application/x-ndjson')
+
+
+async def _track_batch(results: AsyncIterator[str], start: float) -> AsyncIterator[str]:
+  """Count the batch request as in flight until its last result is streamed, and observe its duration."""
+  with BATCH_IN_FLIGHT.track_inprogress():
+    try:
+      async for line in results:
+        yield line
+    finally:
+      BATCH_REQUEST_DURATION.observe(time.perf_counter() - start)
@@ -0,0 +1,84 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import config
+from .metrics_srv import REQUESTS_SHED, ADMISSION_WAITING
+
+
+class Overloaded(Exception):
+  """Raised when a request is shed because the backend is at capacity."""
+
+  def __init__(self, reason: str, retry_after: float):
+    super().__init__(f'Backend overloaded ({reason})')
+    self.reason = reason
+    self.retry_after = retry_after
+
+
+class AdmissionController:
+  _instance = None
+
+  @staticmethod
+  def get_instance():
+    """Singleton pattern to get the instance of the admission controller."""
+    if AdmissionController._instance is None:
+      AdmissionController._instance = AdmissionController()
+    return AdmissionController._instance
+
+  def __init__(self):
+    """Initialize the limits on the inferences that run or wait at the same time."""
+    self.config = config.get_config()
+    self.max_in_flight = self.config.MAX_IN_FLIGHT_INFERENCES
+    self.max_waiting = self.config.ADMISSION_QUEUE_SIZE
+    self.wait_timeout = self.config.ADMISSION_QUEUE_TIMEOUT_S
+    self.retry_after = self.config.RETRY_AFTER_S
+    self.waiting = 0
+    self._slots = asyncio.Semaphore(max(1, self.max_in_flight))
+
+  def _shed(self, reason: str) -> Overloaded:
+    REQUESTS_SHED.labels(reason).inc()
+    return Overloaded(reason, self.retry_after)
+
+  @asynccontextmanager
+  async def admit(self):
+    """Hold one of the inference slots while the block runs.
+
+    Raises:
+        Overloaded: if the request is shed.
+    """
+    await self.acquire()
+    try:
+      yield
+    finally:
+      self.release()
+
+  async def acquire(self):
+    """Take one of the inference slots, it has to be given back with release.
+    Requests wait for a slot in a bounded queue, they are shed right away when the queue
+    is full and after the queue timeout otherwise, so the waiting time stays bounded.
+
+    Raises:
+        Overloaded: if the request is shed.
+    """
+    if self.max_in_flight <= 0:
+      return
+
+    if self._slots.locked():
+      if self.waiting >= self.max_waiting:
+        raise self._shed('queue_full')
+
+      self.waiting += 1
+      ADMISSION_WAITING.inc()
+      try:
+        await asyncio.wait_for(self._slots.acquire(), timeout=self.wait_timeout)
+      except asyncio.TimeoutError:
+        raise self._shed('queue_timeout')
+      finally:
+        self.waiting -= 1
+        ADMISSION_WAITING.dec()
+    else:
+      await self._slots.acquire()
+
+  def release(self):
+    """Give back a slot taken with acquire."""
+    if self.max_in_flight > 0:
+      self._slots.release()
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import torch
+
+import config
+from .executor_srv import InferenceExecutor
+
+
+class InferenceBatcher:
+  _instance = None
+
+  @staticmethod
+  def get_instance():
+    """Singleton pattern to get the instance of the inference batcher."""
+    if InferenceBatcher._instance is None:
+      InferenceBatcher._instance = InferenceBatcher()
+    return InferenceBatcher._instance
+
+  def __init__(self):
+    """Initialize the batcher that groups concurrent requests into one forward pass."""
+    self.config = config.get_config()
+    self.executor = InferenceExecutor.get_instance()
+    self.max_batch_size = self.config.BATCH_MAX_SIZE
+    self.max_wait = self.config.BATCH_MAX_WAIT_MS / 1000
+    self.queue = None
+    self._worker = None
+    self._running = set()
+
+  async def start(self):
+    """Start the background task that collects and runs the batches."""
+    if self._worker is None:
+      self.queue = asyncio.Queue()
+      self._worker = asyncio.create_task(self._run())
+
+  async def stop(self):
+    """Stop the background task and fail all requests that are still queued."""
+    if self._worker is None:
+      return
+
+    self._worker.cancel()
+    try:
+      await self._worker
+    except asyncio.CancelledError:
+      pass
+    self._worker = None
+
+    while not self.queue.empty():
+      _, future = self.queue.get_nowait()
+      if not future.done():
+        future.set_exception(RuntimeError('Inference batcher stopped'))
+
+  async def submit(self, image_bytes: bytes) -> list[tuple[str, float]]:
+    """Queue an image for the next batch and wait for its prediction.
+
+    Args:
+        image_bytes (bytes): bytes of the image.
+
+    Returns:
+        list[tuple[str, float]]: the top-k class labels and probabilities, most likely first.
+    """
+    input_tensor = await self.executor.preprocess(image_bytes)
+
+    future = asyncio.get_running_loop().create_future()
+    await self.queue.put((input_tensor, future))
+    return await future
+
+  async def _collect_batch(self) -> list[tuple[torch.Tensor, asyncio.Future]]:
+    """Wait for the first request, then gather more until the batch is full or the wait expires.
+
+    Returns:
+        list[tuple[torch.Tensor, asyncio.Future]]: the queued tensors and their futures.
+    """
+    loop = asyncio.get_running_loop()
+    batch = [await self.queue.get()]
+    deadline = loop.time() + self.max_wait
+
+    while len(batch) < self.max_batch_size:
+      # take everything that is already waiting without yielding to the loop
+      if not self.queue.empty():
+        batch.append(self.queue.get_nowait())
+        continue
+
+      timeout = deadline - loop.time()
+      if timeout <= 0:
+        break
+      try:
+        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+      except asyncio.TimeoutError:
+        break
+
+    # requests whose client went away do not need a forward pass
+    return [(tensor, future) for tensor, future in batch if not future.done()]
+
+  async def _run(self):
+    """Collect batches and hand them to the executor, at most one batch per executor worker at a time.
+    While all workers are busy, new requests wait in the queue, and the next batch takes them at once.
+    """
+    free_workers = asyncio.Semaphore(max(1, self.executor.max_workers))
+    while True:
+      await free_workers.acquire()
+      batch = await self._collect_batch()
+      if not batch:
+        free_workers.release()
+        continue
+
+      task = asyncio.create_task(self._run_batch(batch))
+      # keep a reference until the task is done, the loop only holds weak references
+      self._running.add(task)
+      task.add_done_callback(self._running.discard)
+      task.add_done_callback(lambda _: free_workers.release())
+
+  async def _run_batch(self, batch: list[tuple[torch.Tensor, asyncio.Future]]):
+    """Run the forward pass for one batch and fan the results back out.
+
+    Args:
+        batch (list[tuple[torch.Tensor, asyncio.Future]]): the queued tensors and their futures.
+    """
+    input_tensor = torch.cat([tensor for tensor, _ in batch])
+    try:
+      results = await self.executor.predict_batch(input_tensor)
+    except Exception as e:
+      logging.exception(f'Error running inference batch: {e}')
+      for _, future in batch:
+        if not future.done():
+          future.set_exception(e)
+      return
+
+    for (_, future), result in zip(batch, results):
+      if not future.done():
+        future.set_result(result)
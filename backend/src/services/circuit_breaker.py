@@ -0,0 +1,68 @@
+import time
+import threading
+
+from .metrics_srv import CIRCUIT_OPEN
+
+
+class CircuitOpenError(Exception):
+  """Raised instead of calling a dependency while its circuit breaker is open."""
+
+
+class CircuitBreaker:
+  CLOSED = 'closed'
+  OPEN = 'open'
+  HALF_OPEN = 'half_open'
+
+  def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+    """Stop calling a failing dependency for a while instead of waiting on it for every request.
+    After failure_threshold consecutive failures the circuit opens and calls are rejected.
+    Once reset_timeout has passed a single trial call is let through, its result closes
+    the circuit again or keeps it open for another reset_timeout.
+
+    Args:
+        name (str): name of the dependency, used as metric label.
+        failure_threshold (int): consecutive failures that open the circuit, 0 disables the breaker.
+        reset_timeout (float): seconds the circuit stays open before the trial call.
+    """
+    self.name = name
+    self.failure_threshold = failure_threshold
+    self.reset_timeout = reset_timeout
+    self.state = self.CLOSED
+    self.failures = 0
+    self.opened_at = 0.0
+    self._lock = threading.Lock()
+    self._open_gauge = CIRCUIT_OPEN.labels(name)
+
+  def allow(self) -> bool:
+    """Check whether a call may be made now.
+
+    Returns:
+        bool: False while the circuit is open or the trial call is still running.
+    """
+    if self.failure_threshold <= 0:
+      return True
+    with self._lock:
+      if self.state == self.CLOSED:
+        return True
+      # open, or half open with a trial call that never reported back
+      if time.monotonic() - self.opened_at >= self.reset_timeout:
+        self.state = self.HALF_OPEN
+        self.opened_at = time.monotonic()
+        return True
+      return False
+
+  def record_success(self):
+    """Close the circuit after a successful call."""
+    with self._lock:
+      self.failures = 0
+      self.state = self.CLOSED
+      self._open_gauge.set(0)
+
+  def record_failure(self):
+    """Count a failed call, the circuit opens at the threshold or when the trial call fails."""
+    with self._lock:
+      self.failures += 1
+      if self.state == self.HALF_OPEN or (0 < self.failure_threshold <= self.failures):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._open_gauge.set(1)
@@ -1,15 +1,42 @@
+import os
 import torch
 import json
-from torchvision import transforms
-from io import BytesIO
 from PIL import Image
+from contextlib import nullcontext
 
 import config
 from .model import FoodClassifier
+from .preprocessing import decode_image, to_normalized_tensor
+from .inference_backends import InferenceBackend, EagerBackend, CompileBackend, TorchScriptBackend, OnnxBackend
+from .shared_weights import prepare_shared_weights, load_state_dict_file, load_shared_state_dict, thread_budget
+from .metrics_srv import STAGE_DURATION, BATCH_SIZE, CASCADE_ESCALATIONS
+
+DECODE_DURATION = STAGE_DURATION.labels('decode')
+TRANSFORM_DURATION = STAGE_DURATION.labels('transform')
+FORWARD_DURATION = STAGE_DURATION.labels('forward')
+
+
+def preprocess_image(image_bytes: bytes, image_size: int, max_image_pixels: int) -> torch.Tensor:
+  """Decode and preprocess a bytes image into the model input, it does not need the model itself.
+
+  Args:
+      image_bytes (bytes): bytes of the image.
+      image_size (int): edge length of the model input.
+      max_image_pixels (int): maximum number of pixels an upload may have.
+
+  Returns:
+      torch.Tensor: preprocessed image tensor of shape [1, 3, image_size, image_size].
+  """
+  with DECODE_DURATION.time():
+    image = decode_image(image_bytes, image_size, max_image_pixels)
+  with TRANSFORM_DURATION.time():
+    tensor = to_normalized_tensor(image, image_size)
+  return tensor.unsqueeze(0)
 
 
 class ClassificationModel:
   _instance = None
+  IMAGE_SIZE = 224
 
   @staticmethod
   def get_instance():
@@ -18,6 +45,43 @@ class ClassificationModel:
       ClassificationModel._instance = ClassificationModel()
     return ClassificationModel._instance
 
+  @staticmethod
+  def get_weights_path() -> str:
+    """Get the file the model is loaded from for the configured precision and backend.
+
+    Returns:
+        str: path of the checkpoint, weights or exported model file.
+    """
+    cfg = config.get_config()
+    if cfg.MODEL_PRECISION == 'int8':
+      return cfg.QUANTIZED_MODEL_PATH
+    if cfg.INFERENCE_BACKEND == 'torchscript':
+      return cfg.TORCHSCRIPT_MODEL_PATH
+    if cfg.INFERENCE_BACKEND == 'onnx':
+      return cfg.ONNX_MODEL_PATH
+    if cfg.WEIGHTS_LOADING_APPROACH == 'wandb':
+      return cfg.CHECKPOINT_PATH
+    return cfg.WEIGHTS_PATH
+
+  @staticmethod
+  def get_model_version() -> str:
+    """Identify the weights file the model is loaded from.
+    It is read once when the model loads (see self.version), a file that is replaced
+    later only takes effect with the next start, together with the new weights.
+
+    Returns:
+        str: version string built from the file names, sizes and modification times.
+    """
+    paths = [ClassificationModel.get_weights_path()]
+    if config.get_config().CASCADE_ENABLED:
+      paths.append(config.get_config().CASCADE_CHECKPOINT_PATH)
+
+    versions = []
+    for path in paths:
+      stat = os.stat(path)
+      versions.append(f'{os.path.basename(path)}-{stat.st_size}-{stat.st_mtime_ns}')
+    return '+'.join(versions)
+
   def __init__(self):
     """Initialize the classification model."""
     self.config = config.get_config()
@@ -25,34 +89,65 @@ class ClassificationModel:
     self.label_path = self.config.LABEL_PATH
     self.num_classes = 101
     self.labels = self._load_labels()
-    self.transform = transforms.Compose(
-      [
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-      ]
-    )
-
-    # here we can choose to load the model from wandb or from local weights
-    if self.config.WEIGHTS_LOADING_APPROACH == 'wandb':
+    self.image_size = ClassificationModel.IMAGE_SIZE
+    self.max_image_pixels = self.config.MAX_IMAGE_PIXELS
+
+    # version of the weights that are loaded below, the result cache is keyed on it
+    self.version = ClassificationModel.get_model_version()
+
+    # split the cores between all forward passes that can run at the same time, so they do not
+    # oversubscribe the cpu. every uvicorn worker runs INFERENCE_WORKERS of them, as worker
+    # threads sharing this process or as worker processes
+    concurrent_passes = self.config.WORKERS * self.config.INFERENCE_WORKERS
+    self.num_threads = thread_budget(self.config.TORCH_NUM_THREADS, concurrent_passes)
+    torch.set_num_threads(self.num_threads)
+
+    # the model is wrapped by the configured inference backend (eager, compile, torchscript or onnx)
+    self.backend = self.config.INFERENCE_BACKEND
+    self.model = self._load_backend()
+
+    # in cascade mode a small model classifies first, the model above only gets the unsure images
+    self.cascade_model = self._load_cascade_model() if self.config.CASCADE_ENABLED else None
+    self.cascade_threshold = self.config.CASCADE_THRESHOLD
+
+  def _load_backend(self) -> InferenceBackend:
+    """Load the model for the configured precision and inference backend.
+
+    Returns:
+        InferenceBackend: the model behind the common backend interface.
+    """
+    if self.config.MODEL_PRECISION == 'int8':
+      # quantized kernels only run on the cpu
+      self.device = torch.device('cpu')
+      return TorchScriptBackend(self.config.QUANTIZED_MODEL_PATH, self.device)
+    if self.backend == 'torchscript':
+      return TorchScriptBackend(self.config.TORCHSCRIPT_MODEL_PATH, self.device)
+    if self.backend == 'onnx':
+      self.device = torch.device('cpu')
+      return OnnxBackend(self.config.ONNX_MODEL_PATH, num_threads=self.num_threads)
+    if self.backend not in ('eager', 'compile'):
+      raise ValueError(f'Unknown inference backend: {self.backend}')
+
+    # here we can choose to memory-map shared weights, load the model from wandb or from local weights
+    if self.config.SHARED_WEIGHTS:
+      self.shared_weights_path = self.config.SHARED_WEIGHTS_PATH
+      model = self._load_model_shared()
+    elif self.config.WEIGHTS_LOADING_APPROACH == 'wandb':
       self.ckpt_path = self.config.CHECKPOINT_PATH
-      self.model = self._load_model_wandb()
+      model = self._load_model_wandb()
     else:
       self.weights_path = self.config.WEIGHTS_PATH
-      self.model = self._load_model_default()
+      model = self._load_model_default()
+
+    return CompileBackend(model) if self.backend == 'compile' else EagerBackend(model)
 
   def _load_model_default(self) -> FoodClassifier:
-    """Load the finetuned ResNet model from a .pth file.
+    """Load the finetuned ResNet model from a .pth or .safetensors file.
 
     Returns:
         FoodClassifier: pre-trained ResNet model.
     """
-    self.model = FoodClassifier(num_classes=self.num_classes)
-    state_dict = torch.load(self.weights_path)
-    self.model.load_state_dict(state_dict)
-    self.model.eval()
-    self.model.to(self.device)
-    return self.model
+    return self._build_model(load_state_dict_file(self.weights_path))
 
   def _load_model_wandb(self) -> FoodClassifier:
     """Load the finetuned ResNet model from a .ckpt file.
@@ -61,12 +156,45 @@ class ClassificationModel:
     Returns:
         FoodClassifier: pre-trained ResNet model.
     """
-    self.model = FoodClassifier(num_classes=self.num_classes)
-    state_dict = torch.load(self.ckpt_path, map_location=self.device)
-    self.model.load_state_dict(state_dict.get('state_dict'))
-    self.model.eval()
-    self.model.to(self.device)
-    return self.model
+    return self._build_model(load_state_dict_file(self.ckpt_path))
+
+  def _load_model_shared(self) -> FoodClassifier:
+    """Load the finetuned ResNet model from memory-mapped weights.
+    All workers on the machine map the same file, so the weights are held in memory only once.
+
+    Returns:
+        FoodClassifier: pre-trained ResNet model.
+    """
+    prepare_shared_weights(ClassificationModel.get_weights_path(), self.shared_weights_path)
+    return self._build_model(load_shared_state_dict(self.shared_weights_path))
+
+  def _load_cascade_model(self) -> InferenceBackend:
+    """Load the small model that runs first in cascade mode.
+
+    Returns:
+        InferenceBackend: the small finetuned model.
+    """
+    state_dict = load_state_dict_file(self.config.CASCADE_CHECKPOINT_PATH)
+    return EagerBackend(self._build_model(state_dict, arch=self.config.CASCADE_ARCH))
+
+  def _build_model(self, state_dict: dict, arch: str = 'resnet50') -> FoodClassifier:
+    """Create the model directly from the loaded weights.
+
+    Args:
+        state_dict (dict): weights of the finetuned model.
+        arch (str): torchvision architecture the weights belong to.
+
+    Returns:
+        FoodClassifier: pre-trained model.
+    """
+    # build the model on the meta device, so no memory is allocated or initialized for its own
+    # parameters, assign then uses the loaded (memory-mapped) tensors instead of copying them
+    with torch.device('meta'):
+      model = FoodClassifier(num_classes=self.num_classes, arch=arch)
+    model.load_state_dict(state_dict, assign=True)
+    model.eval()
+    model.to(self.device)
+    return model
 
   def _load_labels(self) -> list[str]:
     """Load the labels for the classification model.
@@ -80,7 +208,7 @@ class ClassificationModel:
     return labels
 
   def _process_image_bytes(self, image_bytes: bytes) -> Image.Image:
-    """Decode a bytes image to a PIL Image.
+    """Decode a bytes image to a PIL Image, downscaled while decoding where possible.
 
     Args:
         image_bytes (bytes): bytes of the image.
@@ -88,8 +216,7 @@ class ClassificationModel:
     Returns:
         Image.Image: decoded image.
     """
-    image = Image.open(BytesIO(image_bytes)).convert('RGB')
-    return image
+    return decode_image(image_bytes, self.image_size, self.max_image_pixels)
 
   def _preprocess_image_for_resnet(self, image_bytes: bytes) -> torch.Tensor:
     """Preprocess the bytes image for ResNet model.
@@ -100,10 +227,7 @@ class ClassificationModel:
     Returns:
         torch.Tensor: preprocessed image tensor.
     """
-    image = self._process_image_bytes(image_bytes)
-    tensor = self.transform(image)
-    tensor = tensor.unsqueeze(0)
-    return tensor
+    return preprocess_image(image_bytes, self.image_size, self.max_image_pixels)
 
   def _predict(self, input_tensor: torch.Tensor) -> tuple[str, float]:
     """Make a prediction using the model.
@@ -114,15 +238,65 @@ class ClassificationModel:
     Returns:
         tuple[str, float]: predicted class label and probability.
     """
-    with torch.no_grad():
-      output = self.model(input_tensor)  # shape: [1, num_classes]
-      probs = torch.softmax(output, dim=1)
-      # get the predicted class index
-      pred_class = torch.argmax(probs, dim=1).item()
-      # get prob for predicted class
-      pred_prob = probs[0][pred_class].item()
+    return self._predict_batch(input_tensor)[0]
+
+  def _predict_batch(self, input_tensor: torch.Tensor) -> list[tuple[str, float]]:
+    """Make predictions for a batch of images in a single forward pass.
+
+    Args:
+        input_tensor (torch.Tensor): input tensor of shape [N, 3, 224, 224].
+
+    Returns:
+        list[tuple[str, float]]: predicted class label and probability per image.
+    """
+    return [predictions[0] for predictions in self._predict_topk_batch(input_tensor, k=1)]
+
+  def _predict_topk_batch(self, input_tensor: torch.Tensor, k: int, observe: bool = True) -> list[list[tuple[str, float]]]:
+    """Make the top-k predictions for a batch of images in a single forward pass.
+
+    Args:
+        input_tensor (torch.Tensor): input tensor of shape [N, 3, 224, 224].
+        k (int): number of most likely classes to return per image.
+        observe (bool): record the pass in the metrics, off for the warm-up passes.
+
+    Returns:
+        list[list[tuple[str, float]]]: class labels and probabilities per image, most likely first.
+    """
+    if observe:
+      BATCH_SIZE.observe(input_tensor.shape[0])
+    with torch.no_grad(), FORWARD_DURATION.time() if observe else nullcontext():
+      if self.cascade_model is not None:
+        probs = self._cascade_probs(input_tensor, observe)
+      else:
+        output = self.model(input_tensor)  # shape: [N, num_classes]
+        probs = torch.softmax(output, dim=1)
+      # get the k most likely class indices and their probabilities per image
+      pred_probs, pred_classes = torch.topk(probs, k=min(k, self.num_classes), dim=1)
+
+    return [
+      [(self.labels[c], p) for c, p in zip(classes, probabilities)]
+      for classes, probabilities in zip(pred_classes.tolist(), pred_probs.tolist())
+    ]
+
+  def _cascade_probs(self, input_tensor: torch.Tensor, observe: bool = True) -> torch.Tensor:
+    """Classify with the small model and escalate the unsure images to the large model.
+
+    Args:
+        input_tensor (torch.Tensor): input tensor of shape [N, 3, 224, 224].
+        observe (bool): count the escalations in the metrics.
+
+    Returns:
+        torch.Tensor: class probabilities of shape [N, num_classes].
+    """
+    probs = torch.softmax(self.cascade_model(input_tensor), dim=1)
 
-    return self.labels[pred_class], pred_prob
+    # only images below the confidence threshold pay for the large model
+    unsure = probs.max(dim=1).values < self.cascade_threshold
+    if unsure.any():
+      probs[unsure] = torch.softmax(self.model(input_tensor[unsure]), dim=1)
+      if observe:
+        CASCADE_ESCALATIONS.inc(int(unsure.sum()))
+    return probs
 
   def inference(self, image_bytes: bytes) -> tuple[str, float]:
     """Make an inference using the model.
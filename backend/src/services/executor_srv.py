@@ -0,0 +1,207 @@
+import asyncio
+import functools
+import threading
+import multiprocessing
+import torch
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import config
+from .classification_srv import ClassificationModel, preprocess_image
+from .admission_srv import Overloaded
+from .metrics_srv import REQUESTS_SHED
+
+
+# the functions below run inside the executor. they are defined at module level
+# so that they can be pickled and sent to the worker processes of a process pool.
+# every worker process loads the model once through the singleton.
+def _init_worker():
+  """Load the classification model once when a worker starts."""
+  ClassificationModel.get_instance()
+
+
+def _warmup(iterations: int):
+  """Run forward passes on a blank image, so lazy initialization does not hit the first requests."""
+  model = ClassificationModel.get_instance()
+  input_tensor = torch.zeros(1, 3, model.image_size, model.image_size, device=model.device)
+  for _ in range(iterations):
+    # the warm-up passes are not requests, they stay out of the latency metrics
+    model._predict_topk_batch(input_tensor, 1, observe=False)
+
+
+def _model_version() -> str:
+  """Get the version of the weights the model of the worker was loaded from."""
+  return ClassificationModel.get_instance().version
+
+
+def _preprocess(image_bytes: bytes, max_image_pixels: int) -> torch.Tensor:
+  """Decode and preprocess an image in the preprocessing pool, which runs without the model."""
+  return preprocess_image(image_bytes, ClassificationModel.IMAGE_SIZE, max_image_pixels)
+
+
+def _predict_batch(input_tensor: torch.Tensor, k: int) -> list[list[tuple[str, float]]]:
+  """Run the forward pass for a batch of preprocessed images inside the executor."""
+  model = ClassificationModel.get_instance()
+  return model._predict_topk_batch(input_tensor.to(model.device), k)
+
+
+def _inference(image_bytes: bytes, k: int) -> list[tuple[str, float]]:
+  """Run decode, preprocessing and the forward pass for one image inside the executor."""
+  model = ClassificationModel.get_instance()
+  input_tensor = model._preprocess_image_for_resnet(image_bytes).to(model.device)
+  return model._predict_topk_batch(input_tensor, k)[0]
+
+
+class InferenceExecutor:
+  _instance = None
+
+  @staticmethod
+  def get_instance():
+    """Singleton pattern to get the instance of the inference executor."""
+    if InferenceExecutor._instance is None:
+      InferenceExecutor._instance = InferenceExecutor()
+    return InferenceExecutor._instance
+
+  def __init__(self):
+    """Initialize the executor that keeps the CPU bound model work off the event loop."""
+    self.config = config.get_config()
+    self.kind = self.config.INFERENCE_EXECUTOR
+    self.max_workers = self.config.INFERENCE_WORKERS
+    self.preprocess_workers = self.config.PREPROCESS_WORKERS
+    self.queue_size = self.config.INFERENCE_QUEUE_SIZE
+    self.max_image_pixels = self.config.MAX_IMAGE_PIXELS
+    self.top_k = self.config.PREDICTION_TOP_K
+    self.pool = None
+    # decoding runs in its own threads, so forward passes do not wait behind decodes in one queue
+    self.preprocess_pool = None
+    # jobs per pool that are running or waiting for a free worker
+    self.pending = {'inference': 0, 'preprocess': 0}
+    self._pending_lock = threading.Lock()
+
+  def start(self):
+    """Create the worker pools."""
+    if self.pool is None:
+      self.pool = self._create_pool()
+      self.preprocess_pool = ThreadPoolExecutor(max_workers=self.preprocess_workers, thread_name_prefix='preprocess')
+
+  def stop(self):
+    """Shut down the worker pools."""
+    if self.pool is not None:
+      self.pool.shutdown(wait=False, cancel_futures=True)
+      self.preprocess_pool.shutdown(wait=False, cancel_futures=True)
+      self.pool = None
+      self.preprocess_pool = None
+
+  def _create_pool(self) -> Executor:
+    """Create the thread or process pool depending on the configuration.
+
+    Returns:
+        Executor: the worker pool.
+    """
+    if self.kind == 'process':
+      # spawn instead of fork, torch does not survive a fork after its thread pools started
+      return ProcessPoolExecutor(
+        max_workers=self.max_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+      )
+    return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='inference')
+
+  async def run(self, fn, *args):
+    """Run a function in the inference worker pool.
+
+    Args:
+        fn (Callable): module level function to run in the pool.
+        *args: arguments passed to the function.
+
+    Returns:
+        Any: the return value of the function.
+
+    Raises:
+        Overloaded: if the queue is full.
+    """
+    return await self._submit('inference', self.pool, self.max_workers, fn, *args)
+
+  async def _submit(self, name: str, pool: Executor, workers: int, fn, *args):
+    """Run a function in one of the pools.
+    At most workers jobs run while queue_size more wait for a free worker, jobs
+    beyond that are rejected instead of piling up in front of the pool.
+
+    Args:
+        name (str): name of the pool, 'inference' or 'preprocess'.
+        pool (Executor): the pool to run the function in.
+        workers (int): number of workers of the pool.
+        fn (Callable): module level function to run in the pool.
+        *args: arguments passed to the function.
+
+    Returns:
+        Any: the return value of the function.
+
+    Raises:
+        Overloaded: if the queue is full.
+    """
+    with self._pending_lock:
+      if self.pending[name] >= workers + self.queue_size:
+        REQUESTS_SHED.labels(f'{name}_queue_full').inc()
+        raise Overloaded(f'{name}_queue_full', self.config.RETRY_AFTER_S)
+      self.pending[name] += 1
+
+    # the job is counted until the worker finishes it, also when the caller stops waiting for it
+    job = pool.submit(fn, *args)
+    job.add_done_callback(functools.partial(self._job_done, name))
+    return await asyncio.wrap_future(job)
+
+  def _job_done(self, name: str, job):
+    with self._pending_lock:
+      self.pending[name] -= 1
+
+  async def warmup(self, iterations: int):
+    """Run warm-up forward passes on every worker of the pool.
+
+    Args:
+        iterations (int): number of forward passes per worker.
+    """
+    if iterations <= 0:
+      return
+    # one job per worker, in a process pool each worker holds its own model
+    await asyncio.gather(*[self.run(_warmup, iterations) for _ in range(self.max_workers)])
+
+  async def model_version(self) -> str:
+    """Get the version of the model weights loaded in the worker pool.
+
+    Returns:
+        str: the version of the weights.
+    """
+    return await self.run(_model_version)
+
+  async def preprocess(self, image_bytes: bytes) -> torch.Tensor:
+    """Decode and preprocess an image in the preprocessing pool.
+
+    Args:
+        image_bytes (bytes): bytes of the image.
+
+    Returns:
+        torch.Tensor: preprocessed image tensor.
+    """
+    return await self._submit('preprocess', self.preprocess_pool, self.preprocess_workers, _preprocess, image_bytes, self.max_image_pixels)
+
+  async def predict_batch(self, input_tensor: torch.Tensor) -> list[list[tuple[str, float]]]:
+    """Run the forward pass for a batch in the worker pool.
+
+    Args:
+        input_tensor (torch.Tensor): input tensor of shape [N, 3, 224, 224].
+
+    Returns:
+        list[list[tuple[str, float]]]: the top-k class labels and probabilities per image.
+    """
+    return await self.run(_predict_batch, input_tensor, self.top_k)
+
+  async def inference(self, image_bytes: bytes) -> list[tuple[str, float]]:
+    """Make an inference for a single image in the worker pool.
+
+    Args:
+        image_bytes (bytes): bytes of the image.
+
+    Returns:
+        list[tuple[str, float]]: the top-k class labels and probabilities, most likely first.
+    """
+    return await self.run(_inference, image_bytes, self.top_k)
@@ -0,0 +1,136 @@
+import torch
+import torch.nn as nn
+from abc import ABC, abstractmethod
+
+# all backends take the normalized image tensor and return the logits
+INPUT_SHAPE = (1, 3, 224, 224)
+
+
+class InferenceBackend(ABC):
+  """Common interface of the inference runtimes: normalized images [N, 3, 224, 224] in, logits out."""
+
+  name = None
+
+  @abstractmethod
+  def __call__(self, input_tensor: torch.Tensor) -> torch.Tensor:
+    """Run the model on a batch of normalized images and return the logits."""
+
+
+class EagerBackend(InferenceBackend):
+  name = 'eager'
+
+  def __init__(self, model: nn.Module):
+    """Run the PyTorch model as is.
+
+    Args:
+        model (nn.Module): model in eval mode.
+    """
+    self.model = model
+
+  def __call__(self, input_tensor: torch.Tensor) -> torch.Tensor:
+    return self.model(input_tensor)
+
+
+class CompileBackend(EagerBackend):
+  name = 'compile'
+
+  def __init__(self, model: nn.Module):
+    """Run the PyTorch model through torch.compile. The first calls per input shape are slow.
+
+    Args:
+        model (nn.Module): model in eval mode.
+    """
+    # dynamic shapes, otherwise every new batch size triggers a recompilation
+    super().__init__(torch.compile(model, dynamic=True))
+
+
+class TorchScriptBackend(InferenceBackend):
+  name = 'torchscript'
+
+  def __init__(self, path: str, device: torch.device):
+    """Run a TorchScript model exported by export.py (or the int8 model from src/quantize.py).
+
+    Args:
+        path (str): path to the TorchScript file.
+        device (torch.device): device to load the model to.
+    """
+    self.model = torch.jit.load(path, map_location=device)
+    self.model.eval()
+
+  def __call__(self, input_tensor: torch.Tensor) -> torch.Tensor:
+    return self.model(input_tensor)
+
+
+class OnnxBackend(InferenceBackend):
+  name = 'onnx'
+
+  def __init__(self, path: str, num_threads: int = 0):
+    """Run an ONNX model exported by export.py with ONNX Runtime on the cpu.
+
+    Args:
+        path (str): path to the ONNX file.
+        num_threads (int): intra-op threads of ONNX Runtime, 0 lets it decide.
+    """
+    # optional dependency, only needed for this backend
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = num_threads
+    self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+    self.input_name = self.session.get_inputs()[0].name
+
+  def __call__(self, input_tensor: torch.Tensor) -> torch.Tensor:
+    (logits,) = self.session.run(None, {self.input_name: input_tensor.cpu().numpy()})
+    return torch.from_numpy(logits)
+
+
+def export_torchscript(model: nn.Module, path: str):
+  """Trace, freeze and save a model as TorchScript.
+
+  Args:
+      model (nn.Module): model in eval mode.
+      path (str): output file.
+  """
+  with torch.no_grad():
+    traced = torch.jit.trace(model, torch.randn(INPUT_SHAPE))
+    traced = torch.jit.freeze(traced)
+  torch.jit.save(traced, path)
+
+
+def export_onnx(model: nn.Module, path: str, opset: int = 17):
+  """Export a model to ONNX with a dynamic batch dimension.
+
+  Args:
+      model (nn.Module): model in eval mode.
+      path (str): output file.
+      opset (int): ONNX opset version.
+  """
+  with torch.no_grad():
+    torch.onnx.export(
+      model,
+      (torch.randn(INPUT_SHAPE),),
+      path,
+      input_names=['input'],
+      output_names=['logits'],
+      dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+      opset_version=opset,
+      dynamo=False,
+    )
+
+
+def max_abs_difference(reference: InferenceBackend, candidate: InferenceBackend, batch_size: int = 4) -> float:
+  """Compare the logits of two backends on the same random batch.
+
+  Args:
+      reference (InferenceBackend): backend with the expected outputs, usually eager.
+      candidate (InferenceBackend): backend to check.
+      batch_size (int): number of random images, different from the export shape on purpose.
+
+  Returns:
+      float: the largest absolute difference between the logits.
+  """
+  input_tensor = torch.randn(batch_size, *INPUT_SHAPE[1:], generator=torch.Generator().manual_seed(0))
+  with torch.no_grad():
+    expected = reference(input_tensor)
+    actual = candidate(input_tensor)
+  return (expected - actual).abs().max().item()
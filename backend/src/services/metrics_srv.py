@@ -0,0 +1,45 @@
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram, generate_latest
+
+# metrics are kept per process, with a process pool executor the model metrics
+# (decode, transform, forward, batch size) are recorded in the worker processes
+
+# histogram buckets in seconds, from sub-millisecond preprocessing to slow external calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def render() -> bytes:
+  """Render all registered metrics in the Prometheus text format.
+
+  Returns:
+      bytes: the exposition text, served with CONTENT_TYPE_LATEST.
+  """
+  return generate_latest(REGISTRY)
+
+
+# the metrics of the backend
+STAGE_DURATION = Histogram(
+  'smartbite_stage_duration_seconds',
+  'Duration of each stage of a classification request.',
+  ['stage'],
+  buckets=DEFAULT_BUCKETS,
+)
+ERRORS = Counter('smartbite_errors_total', 'Errors per stage.', ['stage'])
+IN_FLIGHT = Gauge('smartbite_requests_in_flight', 'Requests currently being processed.', ['endpoint'])
+BATCH_SIZE = Histogram(
+  'smartbite_batch_size',
+  'Number of images per forward pass.',
+  buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+CACHE_LOOKUPS = Counter('smartbite_cache_lookups_total', 'Cache lookups by cache and result.', ['cache', 'result'])
+CASCADE_ESCALATIONS = Counter(
+  'smartbite_cascade_escalations_total',
+  'Images the cascade escalated from the small to the large model.',
+)
+CIRCUIT_OPEN = Gauge('smartbite_circuit_open', 'Whether the circuit breaker of a dependency is open.', ['dependency'])
+NUTRITION_STATUS = Counter('smartbite_nutrition_status_total', 'Nutrition status of classification results.', ['status'])
+NUTRITION_COALESCED = Counter(
+  'smartbite_nutrition_coalesced_total',
+  'Nutrition lookups that joined an identical nutrition API call already in flight.',
+)
+REQUESTS_SHED = Counter('smartbite_requests_shed_total', 'Requests rejected by the admission limits.', ['reason'])
+ADMISSION_WAITING = Gauge('smartbite_admission_waiting', 'Requests waiting for an inference slot.')
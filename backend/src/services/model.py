@@ -3,10 +3,15 @@ import torchvision.models as models
 
 
 class FoodClassifier(nn.Module):
-  def __init__(self, num_classes=101):
+  def __init__(self, num_classes=101, arch='resnet50'):
     super().__init__()
-    self.model = models.resnet50(weights=models.ResNet50_Weights.DEFAULT)  # Backbone
-    self.model.fc = nn.Linear(self.model.fc.in_features, num_classes)  # Classifier layer
+    # no pretrained weights, they are replaced by the finetuned checkpoint anyway
+    self.model = models.get_model(arch, weights=None)  # Backbone
+    if hasattr(self.model, 'fc'):
+      self.model.fc = nn.Linear(self.model.fc.in_features, num_classes)  # Classifier layer
+    else:
+      # mobilenets end with a classifier block instead of fc
+      self.model.classifier[-1] = nn.Linear(self.model.classifier[-1].in_features, num_classes)
 
   def forward(self, x):
     return self.model(x)
@@ -0,0 +1,126 @@
+import json
+import time
+import sqlite3
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import config
+from .metrics_srv import CACHE_LOOKUPS
+
+CACHE_HITS = CACHE_LOOKUPS.labels('nutrition', 'hit')
+CACHE_MISSES = CACHE_LOOKUPS.labels('nutrition', 'miss')
+CACHE_STALE_HITS = CACHE_LOOKUPS.labels('nutrition', 'stale_hit')
+
+
+class NutritionCache:
+  _instance = None
+
+  @staticmethod
+  def get_instance():
+    """Singleton pattern to get the instance of the nutrition cache."""
+    if NutritionCache._instance is None:
+      NutritionCache._instance = NutritionCache()
+    return NutritionCache._instance
+
+  def __init__(self):
+    """Initialize the in-memory LRU cache and the optional on-disk store."""
+    self.config = config.get_config()
+    self.max_size = self.config.NUTRITION_CACHE_SIZE
+    self.ttl = self.config.NUTRITION_CACHE_TTL_S
+    self.stale = self.config.NUTRITION_CACHE_STALE_S
+    # label -> (expires_at, scores), ordered from least to most recently used
+    self._entries = OrderedDict()
+
+    self._db = None
+    if self.config.NUTRITION_CACHE_PATH:
+      self._db = self._open_store(self.config.NUTRITION_CACHE_PATH)
+      self._load_store()
+
+  def _open_store(self, path: str) -> sqlite3.Connection:
+    """Open (or create) the SQLite file backing the cache.
+
+    Args:
+        path (str): path of the SQLite file.
+
+    Returns:
+        sqlite3.Connection: the open connection.
+    """
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute('CREATE TABLE IF NOT EXISTS nutrition (label TEXT PRIMARY KEY, expires_at REAL, scores TEXT)')
+    db.commit()
+    return db
+
+  def _load_store(self):
+    """Load all entries that can still be served, fresh or stale, from the on-disk store."""
+    rows = self._db.execute(
+      'SELECT label, expires_at, scores FROM nutrition WHERE expires_at > ? ORDER BY expires_at',
+      (time.time() - self.stale,),
+    ).fetchall()
+    for label, expires_at, scores in rows[-self.max_size :]:
+      self._entries[label] = (expires_at, json.loads(scores))
+
+  def get(self, label: str) -> tuple[Optional[Dict], bool]:
+    """Get the cached nutrition scores for a label.
+    Expired scores are still returned during the stale period, flagged so they can be
+    served while they are refreshed. Every lookup is counted once as hit, stale hit or miss.
+
+    Args:
+        label (str): the classification label.
+
+    Returns:
+        tuple[Optional[Dict], bool]: the nutrition scores (None if missing or too old) and whether they are expired.
+    """
+    entry = self._entries.get(label)
+    if entry is None:
+      CACHE_MISSES.inc()
+      return None, False
+
+    expires_at, scores = entry
+    now = time.time()
+    if expires_at <= now:
+      # expired entries are kept until they are refreshed or too old to be served
+      if expires_at + self.stale <= now:
+        del self._entries[label]
+        CACHE_MISSES.inc()
+        return None, False
+      CACHE_STALE_HITS.inc()
+      return scores, True
+
+    self._entries.move_to_end(label)
+    CACHE_HITS.inc()
+    return scores, False
+
+  def set(self, label: str, scores: Dict):
+    """Store the nutrition scores for a label.
+
+    Args:
+        label (str): the classification label.
+        scores (Dict): the nutrition scores.
+    """
+    expires_at = time.time() + self.ttl
+    self._entries[label] = (expires_at, scores)
+    self._entries.move_to_end(label)
+
+    # evict the least recently used entries
+    while len(self._entries) > self.max_size:
+      self._entries.popitem(last=False)
+
+    if self._db is not None:
+      self._db.execute(
+        'INSERT OR REPLACE INTO nutrition (label, expires_at, scores) VALUES (?, ?, ?)',
+        (label, expires_at, json.dumps(scores)),
+      )
+      self._db.commit()
+
+  def __contains__(self, label: str) -> bool:
+    entry = self._entries.get(label)
+    return entry is not None and entry[0] > time.time()
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def close(self):
+    """Close the on-disk store."""
+    if self._db is not None:
+      self._db.close()
+      self._db = None
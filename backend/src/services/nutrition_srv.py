@@ -1,22 +1,229 @@
 import re
+import json
 import httpx
+import asyncio
+import logging
+import functools
 from typing import Dict
 from oauthlib.oauth1 import Client
 from urllib.parse import urlencode
 
 import config
+from .nutrition_cache import NutritionCache
+from .nutrition_table import NutritionTable
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .metrics_srv import STAGE_DURATION, ERRORS, NUTRITION_COALESCED
 
 
 CONFIG = config.get_config()
 
+NUTRITION_DURATION = STAGE_DURATION.labels('nutrition')
+NUTRITION_API_DURATION = STAGE_DURATION.labels('nutrition_api')
+NUTRITION_API_ERRORS = ERRORS.labels('nutrition_api')
+# the calls of the startup cache warm-up are observed apart from the calls requests wait on
+WARMUP_API_DURATION = STAGE_DURATION.labels('nutrition_api_warmup')
+WARMUP_API_ERRORS = ERRORS.labels('nutrition_api_warmup')
+
 # initialize the OAuth1 client
 # signature_type = 'QUERY' ensures that the signature is
 # included in the url query parameters
 signer = Client(client_key=CONFIG.CLIENT_ID, client_secret=CONFIG.CLIENT_SECRET, signature_type='QUERY')
 
+# the pattern (regex) to extract the nutrition values from the food description
+NUTRITION_PATTERN = re.compile(
+  r'Calories:\s*([\d.]+kcal)\s*\|\s*Fat:\s*([\d.]+g)\s*\|\s*Carbs:\s*([\d.]+g)\s*\|\s*Protein:\s*([\d.]+g)'
+)
+
+# application scoped http client, keeps connections to the nutrition API alive between requests
+client = None
+
+# stops calling the nutrition API after repeated failures, requests then get the classification without nutrition
+breaker = CircuitBreaker('nutrition_api', CONFIG.NUTRITION_BREAKER_FAILURES, CONFIG.NUTRITION_BREAKER_RESET_S)
+
+# nutrition API calls in flight per label, concurrent lookups of the same label share one call
+inflight = {}
+
+
+def init_client() -> httpx.AsyncClient:
+  """Create the shared http client for the nutrition API.
+
+  Returns:
+      httpx.AsyncClient: the pooled http client.
+  """
+
+  global client
+  if client is None:
+    client = httpx.AsyncClient(
+      http2=CONFIG.NUTRITION_HTTP2,
+      timeout=httpx.Timeout(
+        CONFIG.NUTRITION_READ_TIMEOUT_S,
+        connect=CONFIG.NUTRITION_CONNECT_TIMEOUT_S,
+      ),
+      limits=httpx.Limits(
+        max_connections=CONFIG.NUTRITION_MAX_CONNECTIONS,
+        max_keepalive_connections=CONFIG.NUTRITION_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=CONFIG.NUTRITION_KEEPALIVE_EXPIRY_S,
+      ),
+    )
+  return client
+
+
+async def close_client():
+  """Close the shared http client and its pooled connections."""
+
+  global client
+  for task in list(inflight.values()):
+    task.cancel()
+  if client is not None:
+    await client.aclose()
+    client = None
+
 
 async def get_nutrition_scores(classification_result: str) -> Dict:
   """Get nutrition scores based on the classification result.
+  Results are served from the nutrition cache when available.
+
+  Args:
+      classification_result (str): the classification result from the food classification service.
+
+  Returns:
+      Dict: the nutrition scores for the classified food item.
+  """
+
+  scores, _ = await lookup_nutrition_scores(classification_result)
+  return scores
+
+
+async def lookup_nutrition_scores(classification_result: str) -> tuple[Dict, str]:
+  """Get nutrition scores based on the classification result, together with their status.
+  Expired cache entries are served stale and refreshed in the background, so a request
+  only waits on the nutrition API for labels that were never fetched (or long ago).
+
+  Args:
+      classification_result (str): the classification result from the food classification service.
+
+  Returns:
+      tuple[Dict, str]: the nutrition scores and 'ok', or 'stale' for expired scores.
+  """
+
+  with NUTRITION_DURATION.time():
+    if CONFIG.NUTRITION_SOURCE == 'table':
+      # offline mode, the nutrition API is only called to refresh the table
+      return NutritionTable.get_instance().get(classification_result), 'ok'
+
+    scores, stale = NutritionCache.get_instance().get(classification_result)
+    if scores is not None:
+      if stale:
+        _revalidate(classification_result)
+        return scores, 'stale'
+      return scores, 'ok'
+
+    # shielded, a request that gives up (deadline, disconnect) does not cancel the call the others wait for
+    return await asyncio.shield(_shared_fetch(classification_result)), 'ok'
+
+
+def _shared_fetch(classification_result: str, warmup: bool = False) -> asyncio.Task:
+  """Start the nutrition API call for a label, or join the call that is already in flight.
+
+  Args:
+      classification_result (str): the classification result from the food classification service.
+      warmup (bool): the call is made by the cache warm-up, its metrics are recorded separately.
+
+  Returns:
+      asyncio.Task: the call, it resolves to the nutrition scores.
+  """
+
+  task = inflight.get(classification_result)
+  if task is not None:
+    NUTRITION_COALESCED.inc()
+    return task
+
+  task = asyncio.create_task(_fetch_and_cache(classification_result, warmup))
+  inflight[classification_result] = task
+  task.add_done_callback(functools.partial(_fetched, classification_result))
+  return task
+
+
+def _fetched(classification_result: str, task: asyncio.Task):
+  inflight.pop(classification_result, None)
+  # retrieve the exception, the callers may all have stopped waiting
+  if not task.cancelled():
+    task.exception()
+
+
+async def _fetch_and_cache(classification_result: str, warmup: bool = False) -> Dict:
+  """Fetch the nutrition scores through the circuit breaker and store them in the cache.
+
+  Args:
+      classification_result (str): the classification result from the food classification service.
+      warmup (bool): the call is made by the cache warm-up, its metrics are recorded separately.
+
+  Returns:
+      Dict: the nutrition scores for the classified food item.
+  """
+
+  if not breaker.allow():
+    raise CircuitOpenError('The nutrition API circuit is open')
+
+  try:
+    with (WARMUP_API_DURATION if warmup else NUTRITION_API_DURATION).time():
+      scores = await _fetch_nutrition_scores(classification_result)
+  except Exception:
+    (WARMUP_API_ERRORS if warmup else NUTRITION_API_ERRORS).inc()
+    breaker.record_failure()
+    raise
+
+  breaker.record_success()
+  NutritionCache.get_instance().set(classification_result, scores)
+  return scores
+
+
+def _revalidate(classification_result: str):
+  """Refresh the nutrition scores of a label in the background, at most once at a time per label.
+
+  Args:
+      classification_result (str): the classification result from the food classification service.
+  """
+
+  if classification_result in inflight:
+    return
+  task = _shared_fetch(classification_result)
+  task.add_done_callback(functools.partial(_revalidated, classification_result))
+
+
+def _revalidated(classification_result: str, task: asyncio.Task):
+  if not task.cancelled() and task.exception() is not None:
+    logging.warning(f'Could not refresh nutrition scores for {classification_result}: {task.exception()}')
+
+
+async def warm_cache(label_path: str):
+  """Fill the nutrition cache for every label the model can predict.
+  Failed lookups are logged and fetched again on their first request.
+
+  Args:
+      label_path (str): path to the json file with the model labels.
+  """
+
+  with open(label_path, 'r') as f:
+    labels = json.load(f)
+
+  cache = NutritionCache.get_instance()
+  # limit the number of concurrent calls to the nutrition API
+  semaphore = asyncio.Semaphore(CONFIG.NUTRITION_CACHE_WARMUP_CONCURRENCY)
+
+  async def warm(label: str):
+    async with semaphore:
+      try:
+        await _shared_fetch(label, warmup=True)
+      except Exception as e:
+        logging.warning(f'Could not warm nutrition cache for {label}: {e}')
+
+  await asyncio.gather(*[warm(label) for label in labels if label not in cache])
+  print(f'Nutrition cache warmed with {len(cache)} entries')
+
+
+async def _fetch_nutrition_scores(classification_result: str) -> Dict:
+  """Fetch the nutrition scores from the nutrition API.
 
   Args:
       classification_result (str): the classification result from the food classification service.
@@ -34,9 +241,8 @@ async def get_nutrition_scores(classification_result: str) -> Dict:
   # sign the url with the OAuth1 client
   signed_url, _, _ = signer.sign(url_with_params, http_method='GET')
 
-  # make the request
-  async with httpx.AsyncClient() as client:
-    res = await client.get(signed_url)
+  # make the request over the pooled connections
+  res = await init_client().get(signed_url)
 
   if res.status_code != 200:
     raise Exception(f'API call failed: {res.status_code} - {res.text}')
@@ -49,11 +255,20 @@ async def get_nutrition_scores(classification_result: str) -> Dict:
     raise Exception(f'API call failed: {data.get("error")}')
 
   # get the first food item from the response
-  stats = data.get('foods').get('food')[0]
+  return _parse_nutrition_scores(data.get('foods').get('food')[0])
+
+
+def _parse_nutrition_scores(stats: Dict) -> Dict:
+  """Extract the nutrition scores from a food item of the nutrition API.
+
+  Args:
+      stats (Dict): the food item with the food_description and food_url.
+
+  Returns:
+      Dict: the nutrition scores for the food item.
+  """
 
-  # the pattern (regex) to extract the nutrition values
-  pattern = r'Calories:\s*([\d.]+kcal)\s*\|\s*Fat:\s*([\d.]+g)\s*\|\s*Carbs:\s*([\d.]+g)\s*\|\s*Protein:\s*([\d.]+g)'
-  match = re.search(pattern, stats.get('food_description'))
+  match = NUTRITION_PATTERN.search(stats.get('food_description'))
 
   if match:
     calories = match.group(1)
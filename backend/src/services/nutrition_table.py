@@ -0,0 +1,55 @@
+import json
+from typing import Dict
+
+import config
+
+
+def load_table(path: str) -> Dict:
+  """Load the nutrition table written by build_nutrition_table.py.
+
+  Args:
+      path (str): path of the JSON table.
+
+  Returns:
+      Dict: the table with the build time, the source and the nutrition scores per label.
+  """
+  with open(path, 'r') as f:
+    return json.load(f)
+
+
+class NutritionTable:
+  _instance = None
+
+  @staticmethod
+  def get_instance():
+    """Singleton pattern to get the instance of the nutrition table."""
+    if NutritionTable._instance is None:
+      NutritionTable._instance = NutritionTable()
+    return NutritionTable._instance
+
+  def __init__(self):
+    """Load the offline nutrition table, it is read once and never changes while serving."""
+    self.config = config.get_config()
+    table = load_table(self.config.NUTRITION_TABLE_PATH)
+    self.built_at = table.get('built_at')
+    self.nutrition = table['nutrition']
+
+  def get(self, label: str) -> Dict:
+    """Get the nutrition scores for a label.
+
+    Args:
+        label (str): the classification label.
+
+    Returns:
+        Dict: the nutrition scores.
+
+    Raises:
+        KeyError: if the label is not in the table.
+    """
+    scores = self.nutrition.get(label)
+    if scores is None:
+      raise KeyError(f'No nutrition scores for {label} in the nutrition table')
+    return scores
+
+  def __len__(self) -> int:
+    return len(self.nutrition)
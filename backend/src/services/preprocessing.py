@@ -0,0 +1,53 @@
+import torch
+import numpy as np
+from io import BytesIO
+from PIL import Image, ImageOps
+
+# imagenet statistics the model was trained with
+MEAN = torch.tensor([0.485, 0.456, 0.406]).view(3, 1, 1)
+STD = torch.tensor([0.229, 0.224, 0.225]).view(3, 1, 1)
+
+# normalize((x / 255 - mean) / std) folded into a single x * scale + shift
+SCALE = 1 / (255 * STD)
+SHIFT = -MEAN / STD
+
+
+def decode_image(image_bytes: bytes, size: int, max_pixels: int) -> Image.Image:
+  """Decode a bytes image to a PIL Image that is only slightly larger than the target size.
+  JPEGs are scaled down by the decoder itself (1/2, 1/4 or 1/8), which avoids decoding
+  every pixel of large phone photos.
+
+  Args:
+      image_bytes (bytes): bytes of the image.
+      size (int): edge length the image will be resized to.
+      max_pixels (int): maximum number of pixels an upload may have.
+
+  Returns:
+      Image.Image: decoded RGB image, upright according to its EXIF orientation.
+  """
+  image = Image.open(BytesIO(image_bytes))
+
+  # only the header is read so far, reject oversized images before decoding them
+  if image.width * image.height > max_pixels:
+    raise ValueError(f'Image too large: {image.width}x{image.height} pixels')
+
+  # the decoded image is never smaller than the requested size
+  image.draft('RGB', (size, size))
+  image = ImageOps.exif_transpose(image)
+  return image.convert('RGB')
+
+
+def to_normalized_tensor(image: Image.Image, size: int) -> torch.Tensor:
+  """Resize an image and convert it to a normalized tensor in one pass.
+
+  Args:
+      image (Image.Image): decoded RGB image.
+      size (int): edge length of the square output.
+
+  Returns:
+      torch.Tensor: normalized image tensor of shape [3, size, size].
+  """
+  # reducing_gap first shrinks by an integer factor, which is much faster for large non-JPEG images
+  image = image.resize((size, size), Image.BILINEAR, reducing_gap=3.0)
+  pixels = torch.from_numpy(np.array(image)).permute(2, 0, 1)  # uint8, [3, size, size]
+  return torch.addcmul(SHIFT, pixels, SCALE)
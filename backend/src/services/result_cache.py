@@ -0,0 +1,95 @@
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import config
+from .metrics_srv import CACHE_LOOKUPS
+
+CACHE_HITS = CACHE_LOOKUPS.labels('result', 'hit')
+CACHE_MISSES = CACHE_LOOKUPS.labels('result', 'miss')
+
+
+class ResultCache:
+  _instance = None
+
+  @staticmethod
+  def get_instance():
+    """Singleton pattern to get the instance of the result cache."""
+    if ResultCache._instance is None:
+      ResultCache._instance = ResultCache()
+    return ResultCache._instance
+
+  def __init__(self):
+    """Initialize the bounded cache of classification results for repeated uploads."""
+    self.config = config.get_config()
+    self.max_size = self.config.RESULT_CACHE_SIZE
+    self.model_version = None
+    self.hits = 0
+    self.misses = 0
+    # key -> result, ordered from least to most recently used
+    self._entries = OrderedDict()
+
+  def set_model_version(self, model_version: str):
+    """Set the version of the loaded model weights, the cache is emptied when it changed.
+
+    Args:
+        model_version (str): the version of the model that produces the results.
+    """
+    if model_version != self.model_version:
+      self._entries.clear()
+      self.model_version = model_version
+
+  def key(self, image_bytes: bytes) -> str:
+    """Build the cache key from the uploaded bytes and the version of the loaded model.
+
+    Args:
+        image_bytes (bytes): bytes of the image.
+
+    Returns:
+        str: the cache key.
+    """
+    digest = hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+    return f'{self.model_version}:{digest}'
+
+  def get(self, key: str) -> Optional[Dict]:
+    """Get the cached result for a key.
+
+    Args:
+        key (str): the cache key.
+
+    Returns:
+        Optional[Dict]: the classification result, or None if not cached.
+    """
+    result = self._entries.get(key)
+    if result is None:
+      self.misses += 1
+      CACHE_MISSES.inc()
+      return None
+
+    self.hits += 1
+    CACHE_HITS.inc()
+    self._entries.move_to_end(key)
+    return result
+
+  def set(self, key: str, result: Dict):
+    """Store the result for a key, evicting the least recently used entries.
+
+    Args:
+        key (str): the cache key.
+        result (Dict): the classification result.
+    """
+    if self.max_size <= 0:
+      return
+
+    self._entries[key] = result
+    self._entries.move_to_end(key)
+    while len(self._entries) > self.max_size:
+      self._entries.popitem(last=False)
+
+  def stats(self) -> Dict:
+    """Get the hit and miss counters of the cache.
+
+    Returns:
+        Dict: number of entries, hits and misses.
+    """
+    return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,78 @@
+import os
+import torch
+
+
+def prepare_shared_weights(source_path: str, target_path: str) -> str:
+  """Write the model weights as a plain state dict that every worker can memory-map.
+  The file is only rewritten when the source checkpoint is newer, and it is replaced
+  atomically, so several workers starting at the same time do not see a partial file.
+
+  Args:
+      source_path (str): Lightning checkpoint or .pth state dict.
+      target_path (str): path of the memory-mappable state dict.
+
+  Returns:
+      str: the target path.
+  """
+  if os.path.exists(target_path) and os.path.getmtime(target_path) >= os.path.getmtime(source_path):
+    return target_path
+
+  state_dict = load_state_dict_file(source_path)
+  # only tensors, so the workers can load the file with weights_only=True
+  state_dict = {key: value.contiguous() for key, value in state_dict.items() if isinstance(value, torch.Tensor)}
+
+  tmp_path = f'{target_path}.{os.getpid()}.tmp'
+  torch.save(state_dict, tmp_path)
+  os.replace(tmp_path, target_path)
+  return target_path
+
+
+def load_state_dict_file(path: str) -> dict:
+  """Load a state dict without reading the whole file up front.
+  .safetensors files are loaded with safetensors, everything else (.ckpt, .pth) is
+  memory-mapped with torch.load. Lightning checkpoints are unwrapped to their state dict.
+
+  Args:
+      path (str): path of the checkpoint or weights file.
+
+  Returns:
+      dict: the state dict on the cpu.
+  """
+  if path.endswith('.safetensors'):
+    # optional dependency, only needed for safetensors checkpoints
+    from safetensors.torch import load_file
+
+    return load_file(path, device='cpu')
+
+  state_dict = torch.load(path, map_location='cpu', mmap=True)
+  return state_dict.get('state_dict', state_dict)
+
+
+def load_shared_state_dict(path: str) -> dict:
+  """Memory-map a state dict written by prepare_shared_weights.
+  The tensors point into the page cache, which is shared read-only by all processes
+  that map the same file, instead of every worker holding its own copy.
+
+  Args:
+      path (str): path of the memory-mappable state dict.
+
+  Returns:
+      dict: the state dict backed by the mapped file.
+  """
+  return torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+
+
+def thread_budget(configured: int, concurrent_passes: int) -> int:
+  """Number of intra-op threads per forward pass, so all passes running at once use each core once.
+
+  Args:
+      configured (int): explicitly configured number of threads, 0 divides the cores.
+      concurrent_passes (int): number of forward passes that can run at the same time on this machine.
+
+  Returns:
+      int: the number of threads.
+  """
+  if configured > 0:
+    return configured
+  cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+  return max(1, cores // max(1, concurrent_passes))
@@ -1,5 +1,8 @@
-import requests
+import io
 import os
+import requests
+from PIL import Image, ImageOps
+from requests.adapters import HTTPAdapter
 
 from dotenv import load_dotenv
 
@@ -8,11 +11,32 @@ load_dotenv()
 # change this to actual backend URL
 BACKEND_URL = os.getenv('BACKEND_URL', 'http://127.0.0.1:8000')
 
+# images are downscaled to this longest edge and sent as JPEG, the backend works on 224x224 anyway (0 = send the original)
+UPLOAD_MAX_EDGE = int(os.getenv('UPLOAD_MAX_EDGE', '320'))
+UPLOAD_JPEG_QUALITY = int(os.getenv('UPLOAD_JPEG_QUALITY', '85'))
+
+# (connect, read) timeouts in seconds
+STATUS_TIMEOUT = (3, 5)
+ANALYZE_TIMEOUT = (3, float(os.getenv('ANALYZE_TIMEOUT_S', '30')))
+
+
+def _create_session() -> requests.Session:
+  session = requests.Session()
+  adapter = HTTPAdapter(pool_maxsize=int(os.getenv('BACKEND_POOL_SIZE', '10')))
+  session.mount('http://', adapter)
+  session.mount('https://', adapter)
+  return session
+
+
+# one session for the whole frontend process, the connections to the backend are kept alive
+# between requests (streamlit reruns the pages on every interaction, but imports this module once)
+session = _create_session()
+
 
 # status check function
 def check_status():
   try:
-    response = requests.get(f'{BACKEND_URL}/api/status')
+    response = session.get(f'{BACKEND_URL}/api/status', timeout=STATUS_TIMEOUT)
     response.raise_for_status()
     print(response.json())
     return None
@@ -21,11 +45,49 @@ def check_status():
     return None
 
 
+### image preparation ###
+def prepare_image(image_file, max_edge=UPLOAD_MAX_EDGE, quality=UPLOAD_JPEG_QUALITY):
+  """Downscale and re-encode an image before it is uploaded.
+
+  Args:
+      image_file: the uploaded file or camera capture.
+      max_edge (int): maximum length of the longest edge in pixels, 0 keeps the original.
+      quality (int): JPEG quality of the re-encoded image.
+
+  Returns:
+      tuple[str, bytes, str]: file name, content and content type to upload.
+  """
+  original = image_file.getvalue()
+  name = getattr(image_file, 'name', 'image.jpg')
+  content_type = getattr(image_file, 'type', None) or 'image/jpeg'
+  if max_edge <= 0:
+    return name, original, content_type
+
+  try:
+    image = Image.open(io.BytesIO(original))
+    # let the JPEG decoder downscale while decoding, then apply the camera orientation
+    image.draft('RGB', (max_edge, max_edge))
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    image.thumbnail((max_edge, max_edge), Image.Resampling.BILINEAR, reducing_gap=3.0)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality, optimize=True)
+  except Exception as e:
+    # send unreadable images as they are, the backend reports the error
+    print(f'Error preparing image: {e}')
+    return name, original, content_type
+
+  # small images can get larger when they are re-encoded
+  if buffer.tell() >= len(original):
+    return name, original, content_type
+  return f'{os.path.splitext(name)[0]}.jpg', buffer.getvalue(), 'image/jpeg'
+
+
 ### image Analysis Function ###
 def analyze_image(image_file):
   try:
-    files = {'image': image_file}
-    response = requests.post(f'{BACKEND_URL}/api/classify', files=files)
+    files = {'image': prepare_image(image_file)}
+    response = session.post(f'{BACKEND_URL}/api/classify', files=files, timeout=ANALYZE_TIMEOUT)
     response.raise_for_status()
     return response.json()
   except requests.exceptions.RequestException as e:
@@ -0,0 +1,163 @@
+import io
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import streamlit as st
+from PIL import Image, ImageOps
+
+# the history is kept in a SQLite file, mount it on a volume to keep it across container restarts
+HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH', 'history.db')
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '10'))
+THUMBNAIL_MAX_EDGE = int(os.getenv('THUMBNAIL_MAX_EDGE', '200'))
+
+
+def make_thumbnail(image_bytes, max_edge=THUMBNAIL_MAX_EDGE, quality=75):
+  """Create a small JPEG of an image for the history.
+
+  Args:
+      image_bytes (bytes): the original image.
+      max_edge (int): maximum length of the longest edge in pixels.
+      quality (int): JPEG quality.
+
+  Returns:
+      bytes: the thumbnail, or None if the image cannot be read.
+  """
+  try:
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft('RGB', (max_edge, max_edge))
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    image.thumbnail((max_edge, max_edge), Image.Resampling.BILINEAR, reducing_gap=3.0)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+  except Exception as e:
+    print(f'Error creating thumbnail: {e}')
+    return None
+
+
+class HistoryStore:
+  def __init__(self, path):
+    """Meals analyzed per history, stored as a thumbnail and the result record.
+
+    Args:
+        path (str): path of the SQLite file.
+    """
+    self.db = sqlite3.connect(path, check_same_thread=False)
+    self.lock = threading.Lock()
+    with self.lock:
+      self.db.execute('PRAGMA journal_mode=WAL')
+      self.db.execute(
+        'CREATE TABLE IF NOT EXISTS meals ('
+        'id INTEGER PRIMARY KEY AUTOINCREMENT, history_id TEXT NOT NULL, created_at REAL NOT NULL, '
+        'label TEXT, confidence REAL, nutrition TEXT, thumbnail BLOB)'
+      )
+      # pages are read newest first per history, the index keeps this independent of the number of meals
+      self.db.execute('CREATE INDEX IF NOT EXISTS meals_history ON meals (history_id, id DESC)')
+      self.db.commit()
+
+  def add(self, history_id, image_bytes, result):
+    """Store an analyzed meal.
+
+    Args:
+        history_id (str): the history the meal belongs to.
+        image_bytes (bytes): the analyzed image, only its thumbnail is stored.
+        result (dict): the classification result of the backend.
+    """
+    with self.lock:
+      self.db.execute(
+        'INSERT INTO meals (history_id, created_at, label, confidence, nutrition, thumbnail) VALUES (?, ?, ?, ?, ?, ?)',
+        (
+          history_id,
+          time.time(),
+          result.get('label', 'Unknown').strip('", '),
+          result.get('probability'),
+          json.dumps(result.get('nutrition') or {}),
+          make_thumbnail(image_bytes),
+        ),
+      )
+      self.db.commit()
+
+  def count(self, history_id):
+    with self.lock:
+      return self.db.execute('SELECT COUNT(*) FROM meals WHERE history_id = ?', (history_id,)).fetchone()[0]
+
+  def page(self, history_id, before_id, page_size):
+    """Load one page of meals, newest first.
+    Pages start after the last meal of the previous page (keyset pagination), so
+    deep pages are read from the index as fast as the first one.
+
+    Args:
+        history_id (str): the history to read.
+        before_id (int): id of the last meal of the previous page, None for the first page.
+        page_size (int): meals per page.
+
+    Returns:
+        list[dict]: the meals of the page.
+    """
+    with self.lock:
+      rows = self.db.execute(
+        'SELECT id, created_at, label, confidence, nutrition, thumbnail FROM meals '
+        'WHERE history_id = ? AND id < ? ORDER BY id DESC LIMIT ?',
+        (history_id, before_id if before_id is not None else 2**63 - 1, page_size),
+      ).fetchall()
+    return [
+      {
+        'id': meal_id,
+        'created_at': created_at,
+        'label': label,
+        'confidence': confidence,
+        'nutrition': json.loads(nutrition),
+        'thumbnail': thumbnail,
+      }
+      for meal_id, created_at, label, confidence, nutrition, thumbnail in rows
+    ]
+
+  def clear(self, history_id):
+    with self.lock:
+      self.db.execute('DELETE FROM meals WHERE history_id = ?', (history_id,))
+      self.db.commit()
+
+
+@st.cache_resource
+def get_store():
+  """One store (and database connection) for all sessions of the frontend process."""
+  return HistoryStore(HISTORY_DB_PATH)
+
+
+def get_history_id():
+  """Identify the history of the current visitor.
+  The id is kept in the url, so the history survives page reloads and can be bookmarked.
+
+  Returns:
+      str: the history id.
+  """
+  if 'history_id' not in st.session_state:
+    st.session_state['history_id'] = st.query_params.get('history') or uuid.uuid4().hex
+  st.query_params['history'] = st.session_state['history_id']
+  return st.session_state['history_id']
+
+
+# the queries are cached until the history changes, reruns of the page do not hit the database
+@st.cache_data(max_entries=256)
+def count_meals(history_id):
+  return get_store().count(history_id)
+
+
+@st.cache_data(max_entries=256)
+def load_page(history_id, before_id=None, page_size=HISTORY_PAGE_SIZE):
+  return get_store().page(history_id, before_id, page_size)
+
+
+def add_meal(history_id, image_bytes, result):
+  get_store().add(history_id, image_bytes, result)
+  count_meals.clear()
+  load_page.clear()
+
+
+def clear_history(history_id):
+  get_store().clear(history_id)
+  count_meals.clear()
+  load_page.clear()
@@ -1,5 +1,6 @@
 import streamlit as st
 from api import analyze_image
+from history_store import add_meal, get_history_id
 
 st.set_page_config(page_title="Analyze Meal", page_icon="🔍")
 
@@ -9,8 +10,7 @@ st.divider()
 # Initialize
 if "current_image" not in st.session_state:
     st.session_state["current_image"] = None
-if "history" not in st.session_state:
-    st.session_state["history"] = []
+history_id = get_history_id()
 
 # Define upload dialog
 @st.dialog("📁 Upload Picture")
@@ -48,21 +48,19 @@ if st.session_state["current_image"]:
             st.error("Error analyzing image.")
         else:
             st.success("Analysis complete!")
+            # Save a thumbnail and the result to the history
+            add_meal(history_id, st.session_state["current_image"].getvalue(), result)
         st.divider()
-        # Save the result to history
-        st.session_state["history"].append({
-            "image": st.session_state["current_image"],
-            "label": result.get("label").strip('", '),
-            "confidence": result.get("probability"),
-            "nutrition": result.get("nutrition")
-        })
 
         # Show result
         col1, col2 = st.columns(2)
         col1.metric("Label", result.get("label", "Unknown").strip('", '))
         col2.metric("Confidence", f"{result.get('probability', '?') * 100:.2f}%")
 
-        nutrition = result.get("nutrition", {})
+        # the backend returns the classification without nutrition when the nutrition API is slow or down
+        nutrition = result.get("nutrition") or {}
+        if result.get("nutrition_status") in ("timeout", "unavailable"):
+            st.warning("Nutrition information is currently unavailable, please try again later.")
         st.markdown(f"### Nutrition Information {(nutrition.get('serving_size', '?').lower())}")
         col1, col2, col3, col4 = st.columns(4)
         col1.metric("Calories", f"{nutrition.get('calories', '?')}")
@@ -1,25 +1,41 @@
+import math
 import streamlit as st
+from history_store import HISTORY_PAGE_SIZE, clear_history, count_meals, get_history_id, load_page
 
 st.set_page_config(page_title="History", page_icon="🍽️")
 
 st.title("Analysis History")
 
-history = st.session_state.get("history", [])
+history_id = get_history_id()
+total = count_meals(history_id)
 
+# the pages are walked from the newest meal, each page starts after the last meal of the one before.
+# a new or cleared meal moves the page boundaries, then the history starts again on the first page
+if st.session_state.get("history_total") != total:
+    st.session_state["history_total"] = total
+    st.session_state["history_cursors"] = [None]
+cursors = st.session_state["history_cursors"]
 
-if not history:
+
+if not total:
     st.info("You haven't analyzed any meals yet.")
 else:
-    for i, entry in enumerate(reversed(history)):
-        st.subheader(f"Meal #{len(history) - i}")
+    # only one page of thumbnails is loaded and rendered per run
+    num_pages = math.ceil(total / HISTORY_PAGE_SIZE)
+    page = len(cursors) - 1
+    entries = load_page(history_id, cursors[-1])
+
+    for i, entry in enumerate(entries):
+        st.subheader(f"Meal #{total - page * HISTORY_PAGE_SIZE - i}")
 
-        st.image(entry["image"], width=200)
+        if entry["thumbnail"]:
+            st.image(entry["thumbnail"], width=200)
 
         col1, col2 = st.columns(2)
-        col1.metric("Label", entry.get("label", "Unknown"))
-        col2.metric("Confidence", f"{entry.get('confidence', 0) * 100:.2f}%")
+        col1.metric("Label", entry.get("label") or "Unknown")
+        col2.metric("Confidence", f"{(entry.get('confidence') or 0) * 100:.2f}%")
 
-        nutrition = entry.get("nutrition", {})
+        nutrition = entry.get("nutrition") or {}
         st.markdown(f"### Nutrition Information {(nutrition.get('serving_size', '?').lower())}")
         col1, col2, col3, col4 = st.columns(4)
         col1.metric("Calories", f"{nutrition.get('calories', '?')}")
@@ -29,6 +45,15 @@ else:
         st.link_button("View Full Nutrition Info", nutrition.get("food_url", "#"), disabled=(nutrition.get("food_url", "#") == '#'))
         st.divider()
 
+    col1, col2, col3 = st.columns([1, 2, 1])
+    if col1.button("← Newer", disabled=page == 0):
+        cursors.pop()
+        st.rerun()
+    col2.caption(f"Page {page + 1} of {num_pages}")
+    if col3.button("Older →", disabled=page + 1 >= num_pages):
+        cursors.append(entries[-1]["id"])
+        st.rerun()
+
 if st.button("🗑️ Clear History"):
-    st.session_state["history"] = []
-    st.rerun()
\ No newline at end of file
+    clear_history(history_id)
+    st.rerun()
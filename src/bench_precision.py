@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import resource
+import argparse
+import itertools
+import multiprocessing
+import torch
+import torch.nn as nn
+
+from model import build_backbone
+from utils import load_config
+
+
+AUTOCAST_DTYPES = {"bf16-mixed": torch.bfloat16, "16-mixed": torch.float16}
+
+
+def train_steps(mode, arch, num_classes, batch_size, steps, warmup_steps, device):
+    """
+    Time optimizer steps of the backbone in one precision / memory format / accumulation mode,
+    the same way the Lightning trainer runs them: forward and backward under autocast for the
+    mixed precisions, the optimizer stepping once every accumulate_grad_batches batches.
+
+    Returns:
+        dict: mode with mean step time, images/sec and peak memory of the process
+    """
+    torch.manual_seed(0)
+    model = build_backbone(arch, num_classes, pretrained=False).to(device).train()
+    if mode["channels_last"]:
+        model = model.to(memory_format=torch.channels_last)
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-4)
+    criterion = nn.CrossEntropyLoss()
+    scaler = torch.amp.GradScaler(device, enabled=mode["precision"] == "16-mixed")
+
+    # the effective batch size is the same in every mode, accumulation splits it into micro-batches
+    micro_batch_size = batch_size // mode["accumulate_grad_batches"]
+    images = torch.randn(micro_batch_size, 3, 224, 224, device=device)
+    labels = torch.randint(0, num_classes, (micro_batch_size,), device=device)
+
+    def step():
+        for _ in range(mode["accumulate_grad_batches"]):
+            x = images.contiguous(memory_format=torch.channels_last) if mode["channels_last"] else images
+            with torch.autocast(device, dtype=AUTOCAST_DTYPES.get(mode["precision"]), enabled=mode["precision"] in AUTOCAST_DTYPES):
+                loss = criterion(model(x), labels) / mode["accumulate_grad_batches"]
+            scaler.scale(loss).backward()
+        scaler.step(optimizer)
+        scaler.update()
+        optimizer.zero_grad(set_to_none=True)
+
+    for _ in range(warmup_steps):
+        step()
+    if device == "cuda":
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+    if device == "cuda":
+        torch.cuda.synchronize()
+    step_time = (time.perf_counter() - start) / steps
+
+    if device == "cuda":
+        peak_memory_mb = torch.cuda.max_memory_allocated() / 2**20
+    else:
+        # peak resident memory of this process, every mode runs in its own process
+        peak_memory_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+    return {**mode, "micro_batch_size": micro_batch_size, "step_time_ms": step_time * 1000,
+            "images_per_second": batch_size / step_time, "peak_memory_mb": peak_memory_mb}
+
+
+def run_isolated(*args):
+    """Run one mode in a fresh process, so the peak memory of a mode does not include the ones before."""
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(train_steps, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare training step time and memory of the precision, channels_last and accumulation modes.")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--arch", default=None, help="backbone, default: model.arch of the config")
+    parser.add_argument("--batch-size", type=int, default=None, help="effective batch size, default: dataset.batch_size of the config")
+    parser.add_argument("--precisions", nargs="+", default=None, help="default: 32 and bf16-mixed, and 16-mixed on a GPU")
+    parser.add_argument("--accumulate", type=int, nargs="+", default=[1, 4], help="accumulate_grad_batches values")
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--warmup-steps", type=int, default=2)
+    parser.add_argument("--output", default="temp/precision_benchmark.json")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    arch = args.arch or config["model"].get("arch", "resnet50")
+    batch_size = args.batch_size or config["dataset"]["batch_size"]
+    precisions = args.precisions or (["32", "bf16-mixed", "16-mixed"] if device == "cuda" else ["32", "bf16-mixed"])
+
+    results = []
+    for precision, channels_last, accumulate in itertools.product(precisions, [False, True], args.accumulate):
+        mode = {"precision": precision, "channels_last": channels_last, "accumulate_grad_batches": accumulate}
+        result = run_isolated(mode, arch, config["model"]["num_classes"], batch_size, args.steps, args.warmup_steps, device)
+        results.append(result)
+        print(f"precision {precision:>10}  channels_last {str(channels_last):>5}  accumulate {accumulate:>2}  "
+              f"{result['step_time_ms']:>9.1f} ms/step  {result['images_per_second']:>7.1f} images/s  "
+              f"{result['peak_memory_mb']:>8.0f} MB")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"device": device, "arch": arch, "batch_size": batch_size, "results": results}, f, indent=2)
+    print(f"Report saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import os
+import json
+import argparse
+import numpy as np
+from PIL import Image
+from multiprocessing import Pool
+
+from dataset import ImageLabelDataset
+from utils import load_config
+
+
+def load_resized(args):
+    """Decode one image and resize it to a square uint8 array of shape [size, size, 3]."""
+    path, size = args
+    with Image.open(path) as image:
+        # let the JPEG decoder skip the resolution that is not needed
+        image.draft("RGB", (size, size))
+        image = image.convert("RGB").resize((size, size), Image.Resampling.BILINEAR, reducing_gap=3.0)
+    return np.asarray(image, dtype=np.uint8)
+
+
+def write_split(dataset, out_dir, split, image_size, shard_size, num_workers):
+    """
+    Write the images of a split as memory-mappable .npy shards of shape [n, size, size, 3]
+    with one label array per shard, and an index file that lists the shards.
+    """
+    pairs = dataset.image_label_pairs
+    shards = []
+    with Pool(num_workers) as pool:
+        for shard_idx, start in enumerate(range(0, len(pairs), shard_size)):
+            shard_pairs = pairs[start:start + shard_size]
+            images_file = f"{split}-{shard_idx:05d}.images.npy"
+            labels_file = f"{split}-{shard_idx:05d}.labels.npy"
+
+            images = np.lib.format.open_memmap(
+                os.path.join(out_dir, images_file), mode="w+", dtype=np.uint8,
+                shape=(len(shard_pairs), image_size, image_size, 3),
+            )
+            jobs = [(os.path.join(dataset.root_dir, path), image_size) for path, _ in shard_pairs]
+            for i, array in enumerate(pool.imap(load_resized, jobs, chunksize=64)):
+                images[i] = array
+            images.flush()
+            del images
+
+            np.save(os.path.join(out_dir, labels_file), np.array([label for _, label in shard_pairs], dtype=np.int64))
+            shards.append({"images": images_file, "labels": labels_file, "num_samples": len(shard_pairs)})
+            print(f"{split}: {start + len(shard_pairs)}/{len(pairs)} images")
+
+    index = {
+        "image_size": image_size,
+        "classes": dataset.classes,
+        "labels": dataset.labels,
+        "shards": shards,
+    }
+    with open(os.path.join(out_dir, f"{split}.json"), "w") as f:
+        json.dump(index, f, indent=2)
+
+
+def main(config=None):
+    parser = argparse.ArgumentParser(description="Pre-decode the dataset into memory-mapped uint8 shards.")
+    parser.add_argument("--splits", nargs="+", default=["train", "val", "test"])
+    parser.add_argument("--num-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if config is None:
+        config = load_config()
+
+    dataset_config = config["dataset"]
+    out_dir = dataset_config["shards_dir"]
+    os.makedirs(out_dir, exist_ok=True)
+
+    for split in args.splits:
+        dataset = ImageLabelDataset(dataset_config[f"{split}_json"], dataset_config["images_dir"])
+        write_split(dataset, out_dir, split, dataset_config["shard_image_size"], dataset_config["shard_size"], args.num_workers)
+
+    print(f"Shards saved to: {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
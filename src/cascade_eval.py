@@ -0,0 +1,104 @@
+import os
+import json
+import time
+import argparse
+import torch
+from torch.utils.data import DataLoader, Subset
+
+from dataset import ImageLabelDataset, build_transform
+from model import FoodClassifier
+from utils import load_config
+
+
+def load_model(ckpt_path, num_classes):
+    model = FoodClassifier.load_from_checkpoint(ckpt_path, num_classes=num_classes, map_location="cpu")
+    return model.eval()
+
+
+def collect_probabilities(model, loader):
+    """Softmax outputs and targets of the whole split, the thresholds are evaluated on these offline."""
+    probs, targets = [], []
+    with torch.no_grad():
+        for images, y in loader:
+            probs.append(torch.softmax(model(images), dim=1))
+            targets.append(y)
+    return torch.cat(probs), torch.cat(targets)
+
+
+def time_per_image(model, dataset, num_samples):
+    """Mean latency in ms of a single-image forward pass, the way the backend serves a request."""
+    with torch.no_grad():
+        model(dataset[0][0].unsqueeze(0))  # warm-up
+        start = time.perf_counter()
+        for i in range(min(num_samples, len(dataset))):
+            model(dataset[i][0].unsqueeze(0))
+    return (time.perf_counter() - start) * 1000 / min(num_samples, len(dataset))
+
+
+def evaluate_thresholds(small_probs, large_probs, targets, small_ms, large_ms, thresholds):
+    """
+    Accuracy and average latency of the cascade per threshold. Images with a small model
+    confidence below the threshold are escalated and pay for both forward passes.
+    """
+    small_conf, small_preds = small_probs.max(dim=1)
+    large_preds = large_probs.argmax(dim=1)
+
+    results = []
+    for threshold in thresholds:
+        escalated = small_conf < threshold
+        preds = torch.where(escalated, large_preds, small_preds)
+        escalation_rate = escalated.float().mean().item()
+        results.append({
+            "threshold": threshold,
+            "accuracy": (preds == targets).float().mean().item(),
+            "escalation_rate": escalation_rate,
+            "avg_latency_ms": small_ms + escalation_rate * large_ms,
+        })
+    return results
+
+
+def main(config=None):
+    parser = argparse.ArgumentParser(description="Latency and accuracy of the small/large model cascade per confidence threshold.")
+    parser.add_argument("--small-checkpoint", default=None)
+    parser.add_argument("--large-checkpoint", default=None)
+    parser.add_argument("--output", default="temp/cascade_report.json")
+    args = parser.parse_args()
+
+    if config is None:
+        config = load_config()
+
+    cascade = config["cascade"]
+    num_classes = config["model"]["num_classes"]
+    torch.set_num_threads(1)  # per-request latency as on a single serving thread
+
+    test_dataset = ImageLabelDataset(config["dataset"]["test_json"], config["dataset"]["images_dir"], build_transform())
+    test_loader = DataLoader(test_dataset, batch_size=config["dataset"]["batch_size"])
+    latency_dataset = Subset(test_dataset, range(min(cascade["latency_samples"], len(test_dataset))))
+
+    small_model = load_model(args.small_checkpoint or cascade["small_checkpoint"], num_classes)
+    large_model = load_model(args.large_checkpoint or cascade["large_checkpoint"], num_classes)
+
+    small_probs, targets = collect_probabilities(small_model, test_loader)
+    large_probs, _ = collect_probabilities(large_model, test_loader)
+    small_ms = time_per_image(small_model, latency_dataset, cascade["latency_samples"])
+    large_ms = time_per_image(large_model, latency_dataset, cascade["latency_samples"])
+
+    report = {
+        "small_model": {"latency_ms": small_ms, "accuracy": (small_probs.argmax(dim=1) == targets).float().mean().item()},
+        "large_model": {"latency_ms": large_ms, "accuracy": (large_probs.argmax(dim=1) == targets).float().mean().item()},
+        "cascade": evaluate_thresholds(small_probs, large_probs, targets, small_ms, large_ms, cascade["thresholds"]),
+    }
+
+    print(f"{'threshold':>9} {'accuracy':>9} {'escalated':>10} {'avg ms':>8}")
+    print(f"{'large':>9} {report['large_model']['accuracy']:>9.4f} {1:>10.2%} {large_ms:>8.2f}")
+    for row in report["cascade"]:
+        print(f"{row['threshold']:>9} {row['accuracy']:>9.4f} {row['escalation_rate']:>10.2%} {row['avg_latency_ms']:>8.2f}")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 import os
 import json
+import bisect
+import numpy as np
+import torch
 from PIL import Image
-from torch.utils.data import Dataset
+from torch.utils.data import DataLoader, Dataset, Subset
+from torchvision import transforms
 
 class ImageLabelDataset(Dataset):
     def __init__(self, json_path, root_dir, transform=None):
@@ -39,4 +43,108 @@ class ImageLabelDataset(Dataset):
         if self.transform:
             image = self.transform(image)
 
-        return image, label
\ No newline at end of file
+        return image, label
+
+
+class ShardedImageDataset(Dataset):
+    """
+    Pre-decoded images from the memory-mapped shards written by src/build_shards.py.
+    Samples are uint8 tensors [3, size, size] that point into the mapped files, nothing is
+    decoded or copied on access, the pages are read from the page cache.
+    """
+
+    def __init__(self, index_path, transform=None):
+        with open(index_path, "r") as f:
+            index = json.load(f)
+
+        self.classes = index["classes"]
+        self.labels = index["labels"]
+        self.transform = transform
+
+        shards_dir = os.path.dirname(index_path)
+        # copy-on-write mapping: writable views for torch.from_numpy, the files are never changed
+        self.images = [np.load(os.path.join(shards_dir, shard["images"]), mmap_mode="c") for shard in index["shards"]]
+        self.targets = [np.load(os.path.join(shards_dir, shard["labels"])) for shard in index["shards"]]
+        # first global index of every shard
+        self.offsets = np.cumsum([0] + [len(labels) for labels in self.targets]).tolist()
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        shard = bisect.bisect_right(self.offsets, idx) - 1
+        i = idx - self.offsets[shard]
+
+        image = torch.from_numpy(self.images[shard][i]).permute(2, 0, 1)  # HWC -> CHW view
+        label = int(self.targets[shard][i])
+
+        if self.transform:
+            image = self.transform(image)
+
+        return image, label
+
+
+def build_transform():
+    # Resize and normalization used by train.py, evaluate.py and quantize.py.
+    # The backend decodes with PIL draft mode and resizes with a reducing gap
+    # (backend/src/services/preprocessing.py), so its inputs differ slightly from these
+    return transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406],
+                             std=[0.229, 0.224, 0.225]),
+    ])
+
+
+def sample_subset(dataset, num_samples, seed=42):
+    """Random, reproducible subset of a dataset. None or a too large number keeps the full dataset."""
+    if num_samples is None or num_samples >= len(dataset):
+        return dataset
+    generator = torch.Generator().manual_seed(seed)
+    indices = torch.randperm(len(dataset), generator=generator)[:num_samples].tolist()
+    return Subset(dataset, indices)
+
+
+def build_shard_transform(image_size=224):
+    """Same preprocessing as the PIL transforms of the JPEG dataset, on the uint8 tensors of the shards."""
+    return transforms.Compose([
+        transforms.Resize((image_size, image_size), antialias=True),
+        transforms.ConvertImageDtype(torch.float32),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406],
+                             std=[0.229, 0.224, 0.225]),
+    ])
+
+
+def create_dataset(config, split, transform=None):
+    """
+    Dataset of a split (train, val or test) in the format selected by dataset.format in config.yaml.
+    The transform is used for the JPEG images, the shards get the matching tensor transform.
+    """
+    dataset_config = config["dataset"]
+    if dataset_config.get("format", "jpeg") == "shards":
+        index_path = os.path.join(dataset_config["shards_dir"], f"{split}.json")
+        return ShardedImageDataset(index_path, build_shard_transform())
+    return ImageLabelDataset(dataset_config[f"{split}_json"], dataset_config["images_dir"], transform)
+
+
+def create_dataloader(dataset, config, shuffle=False):
+    """DataLoader with dataset.batch_size and the worker settings of the dataloader section in config.yaml."""
+    loader_config = config.get("dataloader") or {}
+    num_workers = loader_config.get("num_workers", 0)
+
+    # persistent_workers and prefetch_factor are only valid with worker processes
+    worker_kwargs = {}
+    if num_workers > 0:
+        worker_kwargs["persistent_workers"] = loader_config.get("persistent_workers", False)
+        worker_kwargs["prefetch_factor"] = loader_config.get("prefetch_factor")
+
+    return DataLoader(
+        dataset,
+        batch_size=config["dataset"]["batch_size"],
+        shuffle=shuffle,
+        num_workers=num_workers,
+        pin_memory=loader_config.get("pin_memory", False),
+        **worker_kwargs,
+    )
@@ -1,8 +1,6 @@
 import os
 import shutil
 import torch
-from torch.utils.data import DataLoader
-from torchvision import transforms
 import pytorch_lightning as pl
 from pytorch_lightning.loggers import WandbLogger
 
@@ -12,7 +10,7 @@ import seaborn as sns
 from sklearn.metrics import confusion_matrix
 import numpy as np
 
-from dataset import ImageLabelDataset
+from dataset import create_dataset, create_dataloader, build_transform
 from model import FoodClassifier  # Your LightningModule
 from utils import load_config, download_best_model_artifact_from_run, get_run_id_from_name, log_best_model_as_artifact
 
@@ -39,19 +37,10 @@ def test_model(config=None):
     model.eval()
 
     # Transforms
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                             std=[0.229, 0.224, 0.225]),
-    ])
-
-    test_dataset = ImageLabelDataset(
-        config["dataset"]["test_json"],
-        config["dataset"]["images_dir"],
-        transform
-    )
-    test_loader = DataLoader(test_dataset, batch_size=config["dataset"]["batch_size"])
+    transform = build_transform()
+
+    test_dataset = create_dataset(config, "test", transform)
+    test_loader = create_dataloader(test_dataset, config)
 
     # Trainer
     trainer = pl.Trainer(
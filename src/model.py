@@ -6,13 +6,40 @@ import pytorch_lightning as pl
 from torchmetrics.classification import Accuracy, Precision, Recall, MulticlassAccuracy
 
 
+def build_backbone(arch, num_classes, pretrained=True):
+    """
+    ImageNet backbone from torchvision with a new classifier layer.
+
+    Args:
+        arch (str): torchvision model name, e.g. resnet50, resnet18 or mobilenet_v3_large
+        num_classes (int): Number of output classes
+        pretrained (bool): Start from the ImageNet weights
+
+    Returns:
+        nn.Module: The backbone
+    """
+    backbone = models.get_model(arch, weights="IMAGENET1K_V1" if pretrained else None)
+    if hasattr(backbone, "fc"):
+        # ResNets
+        backbone.fc = nn.Linear(backbone.fc.in_features, num_classes)
+    else:
+        # MobileNets and EfficientNets end with a classifier block
+        backbone.classifier[-1] = nn.Linear(backbone.classifier[-1].in_features, num_classes)
+    return backbone
+
+
 class FoodClassifier(pl.LightningModule):
-    def __init__(self, num_classes, lr=1e-4, out_dir=None):
+    def __init__(self, num_classes, lr=1e-4, out_dir=None, arch="resnet50", channels_last=False, pretrained=True):
         super().__init__()
         self.save_hyperparameters()
 
-        self.model = models.resnet50(pretrained=True) # Backbone
-        self.model.fc = nn.Linear(self.model.fc.in_features, num_classes) # Classifier layer
+        # Backbone with classifier layer, the ImageNet weights are not needed when loading a checkpoint
+        self.model = build_backbone(arch, num_classes, pretrained=pretrained)
+
+        # NHWC layout, convolutions run faster in it with bf16/fp16 on recent CPUs and GPUs
+        self.channels_last = channels_last
+        if channels_last:
+            self.model = self.model.to(memory_format=torch.channels_last)
 
         self.lr = lr
         self.criterion = nn.CrossEntropyLoss()
@@ -30,6 +57,8 @@ class FoodClassifier(pl.LightningModule):
 
 
     def forward(self, x):
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
         return self.model(x)
 
     def training_step(self, batch, batch_idx):
@@ -0,0 +1,132 @@
+import os
+import json
+import copy
+import argparse
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+from dataset import ImageLabelDataset, build_transform, sample_subset
+from model import FoodClassifier
+from utils import load_config
+
+
+def load_fp32_model(ckpt_path, num_classes):
+    """Load the trained Lightning checkpoint and return the plain ResNet backbone in eval mode."""
+    # the backbone is used without the FoodClassifier forward, so it is kept in the default memory format.
+    # the checkpoint overwrites all weights, the ImageNet ones are not downloaded
+    lightning_model = FoodClassifier.load_from_checkpoint(
+        ckpt_path, num_classes=num_classes, channels_last=False, pretrained=False, map_location="cpu"
+    )
+    return lightning_model.model.eval()
+
+
+def quantize_static(model, calibration_loader, engine):
+    """
+    Post-training static quantization (FX graph mode). Weights and activations are int8,
+    the activation ranges are observed on the calibration data.
+    """
+    torch.backends.quantized.engine = engine
+    example_inputs = (torch.randn(1, 3, 224, 224),)
+    prepared = prepare_fx(model, get_default_qconfig_mapping(engine), example_inputs=example_inputs)
+
+    with torch.no_grad():
+        for images, _ in calibration_loader:
+            prepared(images)
+
+    return convert_fx(prepared)
+
+
+def quantize_dynamic_fallback(model):
+    """Dynamic quantization: only the linear layers are int8, activations are quantized on the fly."""
+    return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def top1_accuracy(model, loader):
+    correct, total = 0, 0
+    with torch.no_grad():
+        for images, targets in loader:
+            preds = model(images).argmax(dim=1)
+            correct += (preds == targets).sum().item()
+            total += targets.numel()
+    return correct / total
+
+
+def export_torchscript(model, out_path):
+    """Trace and freeze the quantized model, the backend loads it with torch.jit.load."""
+    with torch.no_grad():
+        traced = torch.jit.trace(model, torch.randn(1, 3, 224, 224))
+        traced = torch.jit.freeze(traced)
+    torch.jit.save(traced, out_path)
+
+
+def quantize_model(config=None, ckpt_path=None, mode=None):
+
+    if config is None:
+        config = load_config()
+
+    qconfig = config["quantization"]
+    mode = mode or qconfig["mode"]
+    output_dir = f"models/{config['run_name']}"
+    ckpt_path = ckpt_path or os.path.join(output_dir, "best_model.pt")
+    out_path = os.path.join(output_dir, "food_classifier_int8.pt")
+
+    transform = build_transform()
+    batch_size = config["dataset"]["batch_size"]
+
+    # Calibration samples from the train split, accuracy check on the test split
+    train_dataset = ImageLabelDataset(config["dataset"]["train_json"], config["dataset"]["images_dir"], transform)
+    test_dataset = ImageLabelDataset(config["dataset"]["test_json"], config["dataset"]["images_dir"], transform)
+    calibration_loader = DataLoader(sample_subset(train_dataset, qconfig["calibration_samples"]), batch_size=batch_size, shuffle=True)
+    test_loader = DataLoader(sample_subset(test_dataset, qconfig["eval_samples"]), batch_size=batch_size)
+
+    # loaded once, quantization works on copies so the fp32 model stays intact for the accuracy check
+    fp32_model = load_fp32_model(ckpt_path, config["model"]["num_classes"])
+
+    if mode == "static":
+        try:
+            int8_model = quantize_static(copy.deepcopy(fp32_model), calibration_loader, qconfig["engine"])
+        except Exception as e:
+            print(f"[WARN] Static quantization failed ({e}), falling back to dynamic quantization.")
+            mode = "dynamic"
+    if mode == "dynamic":
+        int8_model = quantize_dynamic_fallback(copy.deepcopy(fp32_model))
+
+    export_torchscript(int8_model, out_path)
+
+    # Accuracy regression check
+    fp32_acc = top1_accuracy(fp32_model, test_loader)
+    int8_acc = top1_accuracy(torch.jit.load(out_path), test_loader)
+    accuracy_drop = fp32_acc - int8_acc
+
+    report = {
+        "mode": mode,
+        "checkpoint": ckpt_path,
+        "artifact": out_path,
+        "fp32_top1": fp32_acc,
+        "int8_top1": int8_acc,
+        "accuracy_drop": accuracy_drop,
+        "max_accuracy_drop": qconfig["max_accuracy_drop"],
+    }
+    with open(os.path.join(output_dir, "quantization_report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if accuracy_drop > qconfig["max_accuracy_drop"]:
+        raise ValueError(
+            f"Top-1 accuracy dropped by {accuracy_drop:.4f} (fp32 {fp32_acc:.4f}, int8 {int8_acc:.4f}), "
+            f"more than the allowed {qconfig['max_accuracy_drop']}"
+        )
+
+    print(f"✅ Quantized model saved to: {out_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantize the trained FoodClassifier to int8 for CPU inference.")
+    parser.add_argument("--checkpoint", default=None, help="Lightning checkpoint, defaults to models/<run_name>/best_model.pt")
+    parser.add_argument("--mode", choices=["static", "dynamic"], default=None, help="Overrides quantization.mode in config.yaml")
+    args = parser.parse_args()
+
+    quantize_model(ckpt_path=args.checkpoint, mode=args.mode)
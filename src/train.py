@@ -1,11 +1,9 @@
-from torchvision import transforms
-from torch.utils.data import DataLoader
 import pytorch_lightning as pl
 from pytorch_lightning.callbacks import EarlyStopping, ModelCheckpoint
 from pytorch_lightning.loggers import WandbLogger
 import wandb
 from model import FoodClassifier
-from dataset import ImageLabelDataset
+from dataset import create_dataset, create_dataloader, build_transform
 from utils import load_config, save_config, wandb_run_exists
 import json
 import os
@@ -35,37 +33,23 @@ def train_model(config=None):
     os.makedirs("temp", exist_ok=True)
 
     # Transforms
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(
-            mean=[0.485, 0.456, 0.406], 
-            std=[0.229, 0.224, 0.225])
-        ]
-    )
-
-    # Datasets
-    train_dataset = ImageLabelDataset(
-        json_path=config["dataset"]["train_json"],
-        root_dir=config["dataset"]["images_dir"],
-        transform=transform,
-    )
+    transform = build_transform()
 
-    val_dataset = ImageLabelDataset(
-        json_path=config["dataset"]["val_json"],
-        root_dir=config["dataset"]["images_dir"],
-        transform=transform,
-    )
+    # Datasets, JPEG images or pre-decoded shards depending on dataset.format
+    train_dataset = create_dataset(config, "train", transform)
+    val_dataset = create_dataset(config, "val", transform)
 
     # Dataloaders
-    train_loader = DataLoader(train_dataset, batch_size=config["dataset"]["batch_size"], shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=config["dataset"]["batch_size"])
+    train_loader = create_dataloader(train_dataset, config, shuffle=True)
+    val_loader = create_dataloader(val_dataset, config)
 
     # Model
     model = FoodClassifier(
         num_classes=config["model"]["num_classes"],
         lr=config["model"]["lr"],
-        out_dir=output_dir
+        out_dir=output_dir,
+        arch=config["model"].get("arch", "resnet50"),
+        channels_last=config["model"].get("channels_last", False),
     )
 
     # Callbacks
@@ -89,6 +73,8 @@ def train_model(config=None):
         max_epochs=config["trainer"]["max_epochs"],
         accelerator=config["trainer"]["accelerator"],
         devices=config["trainer"]["devices"],
+        precision=config["trainer"]["precision"],
+        accumulate_grad_batches=config["trainer"].get("accumulate_grad_batches", 1),
         logger=wandb_logger,
         callbacks=[checkpoint_cb, earlystop_cb],
     )
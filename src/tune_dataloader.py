@@ -0,0 +1,102 @@
+import os
+import re
+import json
+import time
+import argparse
+import itertools
+import torch
+
+from dataset import create_dataset, create_dataloader, build_transform, sample_subset
+from utils import load_config
+
+
+def candidate_settings(max_workers, cuda):
+    """Loader settings to try: worker counts up to the cores of this host, prefetch depth and pinned memory."""
+    worker_counts = sorted({0, 2, 4, 8, max_workers} & set(range(max_workers + 1)))
+    pin_memory_options = [False, True] if cuda else [False]
+
+    settings = []
+    for num_workers, pin_memory in itertools.product(worker_counts, pin_memory_options):
+        if num_workers == 0:
+            settings.append({"num_workers": 0, "pin_memory": pin_memory, "persistent_workers": False, "prefetch_factor": None})
+            continue
+        for prefetch_factor in (2, 4):
+            settings.append({"num_workers": num_workers, "pin_memory": pin_memory, "persistent_workers": True, "prefetch_factor": prefetch_factor})
+    return settings
+
+
+def images_per_second(dataset, config, settings, epochs):
+    """
+    Throughput of a loader over several epochs, including the worker start-up,
+    so settings that keep their workers between epochs get the benefit they have in training.
+    """
+    loader = create_dataloader(dataset, dict(config, dataloader=settings), shuffle=True)
+    num_images = 0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for images, _ in loader:
+            num_images += images.shape[0]
+    elapsed = time.perf_counter() - start
+    del loader  # shut down persistent workers before the next setting starts its own
+    return num_images / elapsed
+
+
+def write_dataloader_config(path, settings):
+    """Replace the values of the dataloader section in config.yaml, keeping its comments and layout."""
+    with open(path, "r") as f:
+        lines = f.read().split("\n")
+
+    in_section = False
+    for i, line in enumerate(lines):
+        if re.match(r"^\S", line):
+            in_section = line.startswith("dataloader:")
+            continue
+        match = re.match(r"^(\s+)(\w+):(\s*)([^#]*?)(\s*#.*)?$", line)
+        if in_section and match and match.group(2) in settings:
+            indent, key, space, old_value, comment = match.groups()
+            value = json.dumps(settings[key])  # true, false, null and numbers are the same in yaml
+            if comment:
+                value = value.ljust(len(old_value))  # keep the comments aligned
+            lines[i] = f"{indent}{key}:{space or ' '}{value}{comment or ''}"
+
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DataLoader settings on this host and write the fastest into config.yaml.")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--split", default="train")
+    parser.add_argument("--num-samples", type=int, default=2048, help="images per epoch")
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--dry-run", action="store_true", help="only report, do not change the config")
+    parser.add_argument("--output", default="temp/dataloader_benchmark.json")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    dataset = sample_subset(create_dataset(config, args.split, build_transform()), args.num_samples)
+
+    results = []
+    for settings in candidate_settings(args.max_workers, torch.cuda.is_available()):
+        throughput = images_per_second(dataset, config, settings, args.epochs)
+        results.append({**settings, "images_per_second": throughput})
+        print(f"workers {settings['num_workers']:>3}  prefetch {str(settings['prefetch_factor']):>4}  "
+              f"pin_memory {str(settings['pin_memory']):>5}  {throughput:>8.1f} images/s")
+
+    best = max(results, key=lambda r: r["images_per_second"])
+    best_settings = {key: value for key, value in best.items() if key != "images_per_second"}
+    print(f"Best: {best_settings} with {best['images_per_second']:.1f} images/s")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"dataset_format": config["dataset"].get("format", "jpeg"), "results": results, "best": best_settings}, f, indent=2)
+    print(f"Report saved to: {args.output}")
+
+    if not args.dry_run:
+        write_dataloader_config(args.config, best_settings)
+        print(f"Dataloader settings written to: {args.config}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
+import json
 import requests
-import pytest
 import os
 from pathlib import Path
 
@@ -32,3 +32,28 @@ def test_classify_endpoint():
   assert 'label' in result
   assert 'probability' in result
   assert 'nutrition' in result
+  assert result.get('nutrition_status') in ('ok', 'stale', 'timeout', 'unavailable')
+
+
+def test_classify_batch_endpoint():
+  """test that the batch classification endpoint
+  - streams one NDJSON line per uploaded image
+  - reports broken images inline without failing the batch"""
+
+  image_path = Path(__file__).parent.parent / 'fixtures' / 'sample_images' / 'hamburger.jpg'
+  image_bytes = image_path.read_bytes()
+
+  files = [
+    ('images', ('hamburger_1.jpg', image_bytes, 'image/jpeg')),
+    ('images', ('broken.jpg', b'not an image', 'image/jpeg')),
+    ('images', ('hamburger_2.jpg', image_bytes, 'image/jpeg')),
+  ]
+  response = requests.post(f'{API_URL}/api/classify/batch', files=files)
+
+  assert response.status_code == 200
+  results = {r['filename']: r for r in map(json.loads, response.text.splitlines())}
+  assert len(results) == 3
+  assert 'error' in results['broken.jpg']
+  for name in ('hamburger_1.jpg', 'hamburger_2.jpg'):
+    assert 'label' in results[name]
+    assert 'nutrition' in results[name]
@@ -0,0 +1,82 @@
+import asyncio
+import random
+import argparse
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency_ms: float = 50, jitter_ms: float = 0, error_rate: float = 0, seed: int = 0) -> FastAPI:
+  """Create a stand-in for the FatSecret foods.search endpoint.
+  The OAuth signature in the query is accepted without checking it.
+
+  Args:
+      latency_ms (float): mean response time of a call.
+      jitter_ms (float): the response time varies uniformly by up to this much in both directions.
+      error_rate (float): share of calls that fail, half as http 500 and half as
+          FatSecret style error payload with status 200.
+      seed (int): seed of the random generator, so runs are reproducible.
+
+  Returns:
+      FastAPI: the fake nutrition API.
+  """
+
+  app = FastAPI()
+  rng = random.Random(seed)
+  app.state.calls = 0
+
+  @app.get('/search')
+  async def search(search_expression: str = ''):
+    app.state.calls += 1
+    await asyncio.sleep(max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000)
+
+    if rng.random() < error_rate:
+      if rng.random() < 0.5:
+        return JSONResponse({'message': 'Internal Server Error'}, status_code=500)
+      # fatsecret reports most errors with status code 200
+      return {'error': {'code': 12, 'message': 'User is performing too many actions: please try again later'}}
+
+    name = search_expression.replace('_', ' ')
+    slug = search_expression.replace('_', '-')
+    return {
+      'foods': {
+        'food': [
+          {
+            'food_description': 'Per 100g - Calories: 250kcal | Fat: 10.00g | Carbs: 30.00g | Protein: 12.00g',
+            'food_id': '1',
+            'food_name': name.title(),
+            'food_type': 'Generic',
+            'food_url': f'https://www.fatsecret.com/calories-nutrition/generic/{slug}',
+          }
+        ],
+        'max_results': '20',
+        'page_number': '0',
+        'total_results': '1',
+      }
+    }
+
+  @app.get('/stats')
+  async def stats(request: Request):
+    return {'calls': request.app.state.calls}
+
+  return app
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Local stand-in for the FatSecret foods.search API.')
+  parser.add_argument('--host', default='127.0.0.1')
+  parser.add_argument('--port', type=int, default=9000)
+  parser.add_argument('--latency-ms', type=float, default=50)
+  parser.add_argument('--jitter-ms', type=float, default=0)
+  parser.add_argument('--error-rate', type=float, default=0)
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  app = create_app(args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+  print(f'Point the backend to it with NUTRITION_API_URL=http://{args.host}:{args.port}/search')
+  uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+  main()
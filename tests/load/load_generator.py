@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+
+import httpx
+
+API_URL = os.environ.get('API_URL', 'http://localhost:8000')
+FIXTURES_DIR = Path(__file__).parent.parent / 'fixtures' / 'sample_images'
+
+
+def load_images(images_dir: Path) -> list[tuple[str, bytes]]:
+  """Read the images the load is generated with.
+
+  Args:
+      images_dir (Path): directory with jpg or png images.
+
+  Returns:
+      list[tuple[str, bytes]]: file name and content of each image.
+  """
+
+  paths = sorted(p for p in images_dir.iterdir() if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+  if not paths:
+    raise FileNotFoundError(f'No images found in {images_dir}')
+  return [(p.name, p.read_bytes()) for p in paths]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+  """Nearest-rank percentile of an already sorted list."""
+  if not sorted_values:
+    return float('nan')
+  index = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values)) - 1))
+  return sorted_values[index]
+
+
+async def run_level(
+  client: httpx.AsyncClient, url: str, images: list, concurrency: int, num_requests: int, unique: bool
+) -> dict:
+  """Send num_requests classifications with a fixed number of requests in flight.
+
+  Args:
+      client (httpx.AsyncClient): client with enough pooled connections for the concurrency.
+      url (str): classify endpoint.
+      images (list): file name and content of the images, used round robin.
+      concurrency (int): number of requests in flight.
+      num_requests (int): total number of requests of this level.
+      unique (bool): append a per-request suffix to every image, so the result cache
+          of the backend does not answer the repeated fixture images.
+
+  Returns:
+      dict: throughput, latency percentiles and error rate of the level.
+  """
+
+  latencies, errors, statuses = [], 0, {}
+  counter = iter(range(num_requests))
+
+  async def worker():
+    nonlocal errors
+    for i in counter:
+      name, content = images[i % len(images)]
+      if unique:
+        # decoders ignore data after the end of the image, but the cache key changes
+        content = content + f'{time.time_ns()}-{i}'.encode()
+      start = time.perf_counter()
+      try:
+        response = await client.post(url, files={'image': (name, content, 'image/jpeg')})
+        status = str(response.status_code)
+      except httpx.HTTPError as e:
+        status = type(e).__name__
+      latencies.append(time.perf_counter() - start)
+      statuses[status] = statuses.get(status, 0) + 1
+      if status != '200':
+        errors += 1
+
+  start = time.perf_counter()
+  await asyncio.gather(*[worker() for _ in range(concurrency)])
+  elapsed = time.perf_counter() - start
+
+  latencies.sort()
+  return {
+    'concurrency': concurrency,
+    'requests': num_requests,
+    'duration_s': round(elapsed, 3),
+    'throughput_rps': round(num_requests / elapsed, 2),
+    'error_rate': round(errors / num_requests, 4),
+    'status_codes': statuses,
+    'latency_ms': {
+      'mean': round(sum(latencies) / len(latencies) * 1000, 2),
+      'p50': round(percentile(latencies, 50) * 1000, 2),
+      'p95': round(percentile(latencies, 95) * 1000, 2),
+      'p99': round(percentile(latencies, 99) * 1000, 2),
+      'max': round(latencies[-1] * 1000, 2),
+    },
+  }
+
+
+def find_regressions(report: dict, baseline: dict, max_regression: float) -> list[str]:
+  """Compare the levels of a report with the same concurrency levels of a baseline report.
+
+  Args:
+      report (dict): the current report.
+      baseline (dict): a report of an earlier release.
+      max_regression (float): allowed relative increase of p95 latency and decrease of throughput.
+
+  Returns:
+      list[str]: a description of every regression, empty if there are none.
+  """
+
+  previous = {level['concurrency']: level for level in baseline['levels']}
+  regressions = []
+  for level in report['levels']:
+    base = previous.get(level['concurrency'])
+    if base is None:
+      continue
+    c = level['concurrency']
+    if level['latency_ms']['p95'] > base['latency_ms']['p95'] * (1 + max_regression):
+      regressions.append(f'concurrency {c}: p95 {base["latency_ms"]["p95"]}ms -> {level["latency_ms"]["p95"]}ms')
+    if level['throughput_rps'] < base['throughput_rps'] * (1 - max_regression):
+      regressions.append(f'concurrency {c}: throughput {base["throughput_rps"]} -> {level["throughput_rps"]} req/s')
+    if level['error_rate'] > base['error_rate'] + max_regression:
+      regressions.append(f'concurrency {c}: error rate {base["error_rate"]} -> {level["error_rate"]}')
+  return regressions
+
+
+async def run(args) -> dict:
+  images = load_images(Path(args.images))
+  url = f'{args.url}/api/classify'
+  limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+
+  async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+    # warm-up requests are not part of the report
+    if args.warmup:
+      await run_level(client, url, images, min(4, args.warmup), args.warmup, args.unique)
+
+    levels = []
+    for concurrency in args.concurrency:
+      level = await run_level(client, url, images, concurrency, args.requests, args.unique)
+      print(
+        f'concurrency {concurrency:>4}: {level["throughput_rps"]:>8.2f} req/s'
+        f'  p50 {level["latency_ms"]["p50"]:>8.2f}ms  p95 {level["latency_ms"]["p95"]:>8.2f}ms'
+        f'  p99 {level["latency_ms"]["p99"]:>8.2f}ms  errors {level["error_rate"]:.2%}',
+        file=sys.stderr,
+      )
+      levels.append(level)
+
+  return {
+    'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    'url': url,
+    'images': [name for name, _ in images],
+    'unique_images': args.unique,
+    'levels': levels,
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Load test of the /api/classify endpoint.')
+  parser.add_argument('--url', default=API_URL, help='base url of the backend')
+  parser.add_argument('--images', default=str(FIXTURES_DIR), help='directory with the images to send')
+  parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help='requests in flight per level')
+  parser.add_argument('--requests', type=int, default=200, help='requests per concurrency level')
+  parser.add_argument('--warmup', type=int, default=10, help='requests before the first level, not reported')
+  parser.add_argument('--timeout', type=float, default=60, help='timeout of a single request in seconds')
+  parser.add_argument(
+    '--unique', action=argparse.BooleanOptionalAction, default=True, help='bypass the result cache of the backend'
+  )
+  parser.add_argument('--output', default=None, help='write the JSON report to this file')
+  parser.add_argument('--baseline', default=None, help='JSON report of an earlier run to compare with')
+  parser.add_argument('--max-regression', type=float, default=0.2, help='allowed relative regression')
+  args = parser.parse_args()
+
+  report = asyncio.run(run(args))
+
+  if args.baseline:
+    with open(args.baseline, 'r') as f:
+      report['regressions'] = find_regressions(report, json.load(f), args.max_regression)
+
+  text = json.dumps(report, indent=2)
+  if args.output:
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+      f.write(text)
+  print(text)
+
+  if report.get('regressions'):
+    print('Performance regressions:\n' + '\n'.join(report['regressions']), file=sys.stderr)
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# the unit tests import the backend modules the same way the backend does (from src.services import ...)
+BACKEND_DIR = Path(__file__).parent.parent.parent / 'backend'
+sys.path.insert(0, str(BACKEND_DIR))
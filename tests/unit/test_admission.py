@@ -0,0 +1,73 @@
+import json
+import asyncio
+
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('httpx')
+pytest.importorskip('oauthlib')
+
+from src.controllers import main_ctrl  # noqa: E402
+from src.services.admission_srv import AdmissionController  # noqa: E402
+from src.services.executor_srv import InferenceExecutor  # noqa: E402
+from src.services.result_cache import ResultCache  # noqa: E402
+
+
+class FakeExecutor:
+  """Executor that records the batch size and concurrency of its forward passes."""
+
+  max_workers = 2
+
+  def __init__(self):
+    self.batch_sizes = []
+    self.running = 0
+    self.max_running = 0
+
+  async def preprocess(self, image_bytes):
+    if image_bytes == b'broken':
+      raise ValueError('cannot identify image file /tmp/upload')
+    return torch.zeros(1, 3, 2, 2)
+
+  async def predict_batch(self, input_tensor):
+    self.batch_sizes.append(input_tensor.shape[0])
+    self.running += 1
+    self.max_running = max(self.max_running, self.running)
+    await asyncio.sleep(0.01)
+    self.running -= 1
+    return [[('Pizza', 0.9)] for _ in input_tensor]
+
+
+def test_batch_larger_than_the_admission_queue_is_not_shed(monkeypatch):
+  """test that a batch with more images than in-flight slots plus queue places gets a result for every image
+  - the batch holds one admission slot, its images run in one forward pass per chunk of BATCH_MAX_SIZE
+  - at most max_workers chunks run at a time, a broken image gets a stable error message"""
+  admission = AdmissionController()
+  admission.max_in_flight, admission.max_waiting, admission.wait_timeout = 2, 1, 0.05
+  admission._slots = asyncio.Semaphore(2)
+  executor = FakeExecutor()
+  chunk_size = main_ctrl.CONFIG.BATCH_MAX_SIZE
+
+  async def with_nutrition(predictions):
+    return {'label': predictions[0][0], 'probability': predictions[0][1], 'nutrition': {}, 'nutrition_status': 'ok'}
+
+  monkeypatch.setattr(AdmissionController, '_instance', admission)
+  monkeypatch.setattr(InferenceExecutor, '_instance', executor)
+  monkeypatch.setattr(ResultCache, '_instance', None)
+  monkeypatch.setattr(main_ctrl, '_with_nutrition', with_nutrition)
+
+  async def classify():
+    images = [(f'{i}.jpg', f'image {i}'.encode()) for i in range(60)] + [('60.jpg', b'broken')]
+    lines = [line async for line in await main_ctrl.classify_batch(images)]
+    await asyncio.sleep(0)  # the slot is released in a done callback
+    return [json.loads(line) for line in lines]
+
+  results = sorted(asyncio.run(classify()), key=lambda result: result['index'])
+
+  assert [result['index'] for result in results] == list(range(61))
+  assert all(result['label'] == 'Pizza' for result in results[:60])
+  assert results[60] == {'index': 60, 'filename': '60.jpg', 'error': 'Invalid image'}
+  assert executor.batch_sizes.count(chunk_size) == 60 // chunk_size
+  assert sum(executor.batch_sizes) == 60
+  assert len(executor.batch_sizes) == -(-61 // chunk_size)
+  assert executor.max_running <= executor.max_workers
+  assert not admission._slots.locked() and admission._slots._value == 2
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+torch = pytest.importorskip('torch')
+
+from src.services.batching_srv import InferenceBatcher  # noqa: E402
+
+
+class FakeExecutor:
+  """Executor with instant preprocessing and a slow forward pass that records its batch sizes."""
+
+  max_workers = 1
+
+  def __init__(self):
+    self.batch_sizes = []
+
+  async def preprocess(self, image_bytes):
+    return torch.full((1, 3, 2, 2), float(image_bytes[0]))
+
+  async def predict_batch(self, input_tensor):
+    self.batch_sizes.append(input_tensor.shape[0])
+    await asyncio.sleep(0.02)
+    return [[(f'class_{int(image[0, 0, 0])}', 1.0)] for image in input_tensor]
+
+
+def test_concurrent_requests_share_forward_passes():
+  """test that concurrent submits are answered by fewer forward passes than requests, each with several images
+  - every request still gets the prediction of its own image"""
+  num_requests = 16
+  executor = FakeExecutor()
+  batcher = InferenceBatcher()
+  batcher.executor = executor
+
+  async def submit_all():
+    await batcher.start()
+    try:
+      return await asyncio.gather(*[batcher.submit(bytes([i])) for i in range(num_requests)])
+    finally:
+      await batcher.stop()
+
+  results = asyncio.run(submit_all())
+
+  assert results == [[(f'class_{i}', 1.0)] for i in range(num_requests)]
+  assert sum(executor.batch_sizes) == num_requests
+  assert len(executor.batch_sizes) < num_requests
+  assert all(size > 1 for size in executor.batch_sizes)
+
+
+def test_requests_arriving_during_a_forward_pass_are_batched():
+  """test that requests arriving one by one while a forward pass runs wait for the next batch
+  instead of each starting a forward pass of its own"""
+  num_requests = 12
+  executor = FakeExecutor()
+  batcher = InferenceBatcher()
+  batcher.executor = executor
+  batcher.max_batch_size, batcher.max_wait = 8, 0.001
+
+  async def submit_staggered():
+    await batcher.start()
+    try:
+      tasks = []
+      for i in range(num_requests):
+        tasks.append(asyncio.create_task(batcher.submit(bytes([i]))))
+        await asyncio.sleep(0.005)  # longer than max_wait, shorter than a forward pass
+      return await asyncio.gather(*tasks)
+    finally:
+      await batcher.stop()
+
+  results = asyncio.run(submit_staggered())
+
+  assert results == [[(f'class_{i}', 1.0)] for i in range(num_requests)]
+  # only the first request finds the model idle, the others wait for the running pass and share the
+  # next ones (the last pass may hold a single late request)
+  assert executor.batch_sizes[0] == 1
+  assert sum(executor.batch_sizes) == num_requests
+  assert len(executor.batch_sizes) <= num_requests // 2
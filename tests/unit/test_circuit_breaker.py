@@ -0,0 +1,32 @@
+import time
+
+from src.services.circuit_breaker import CircuitBreaker
+
+
+def test_circuit_opens_after_consecutive_failures():
+  """test that the breaker rejects calls after the failure threshold and lets one trial call through after the reset timeout"""
+  breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=0.05)
+
+  breaker.record_failure()
+  assert breaker.allow()
+  breaker.record_failure()
+  assert not breaker.allow()
+
+  time.sleep(0.06)
+  assert breaker.allow()  # trial call
+  assert not breaker.allow()  # only one at a time
+
+  breaker.record_success()
+  assert breaker.allow()
+  assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_call_reopens_circuit():
+  """test that a failing trial call opens the circuit again"""
+  breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0.05)
+  breaker.record_failure()
+
+  time.sleep(0.06)
+  assert breaker.allow()
+  breaker.record_failure()
+  assert not breaker.allow()
@@ -0,0 +1,50 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+torchvision = pytest.importorskip('torchvision')
+
+from src.services.inference_backends import (  # noqa: E402
+  InferenceBackend,
+  EagerBackend,
+  TorchScriptBackend,
+  OnnxBackend,
+  export_torchscript,
+  export_onnx,
+  max_abs_difference,
+)
+
+TOLERANCE = 1e-3
+
+
+@pytest.fixture(scope='module')
+def eager():
+  """small randomly initialized model, parity does not depend on the trained weights"""
+  torch.manual_seed(0)
+  return EagerBackend(torchvision.models.resnet18(num_classes=101).eval())
+
+
+def test_torchscript_matches_eager(eager, tmp_path):
+  """test that the exported TorchScript model returns the same logits as the eager model"""
+  path = str(tmp_path / 'model.torchscript.pt')
+  export_torchscript(eager.model, path)
+
+  assert max_abs_difference(eager, TorchScriptBackend(path, torch.device('cpu'))) <= TOLERANCE
+
+
+def test_onnx_matches_eager(eager, tmp_path):
+  """test that the exported ONNX model returns the same logits as the eager model
+  - also checks that the batch dimension is dynamic"""
+  pytest.importorskip('onnxruntime')
+  path = str(tmp_path / 'model.onnx')
+  export_onnx(eager.model, path)
+
+  assert max_abs_difference(eager, OnnxBackend(path), batch_size=3) <= TOLERANCE
+
+
+def test_backend_without_call_cannot_be_built():
+  """test that a backend that does not implement __call__ fails when it is created, not on the first request"""
+  class IncompleteBackend(InferenceBackend):
+    name = 'incomplete'
+
+  with pytest.raises(TypeError):
+    IncompleteBackend()
@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip('torch')
+
+from src.services.executor_srv import InferenceExecutor  # noqa: E402
+from src.services.admission_srv import Overloaded  # noqa: E402
+
+
+def test_jobs_beyond_the_queue_are_rejected():
+  """test that the executor runs max_workers jobs, queues queue_size more and rejects the rest"""
+  release = threading.Event()
+  executor = InferenceExecutor()
+  executor.kind, executor.max_workers, executor.queue_size = 'thread', 2, 3
+  executor.start()
+
+  async def jobs():
+    tasks = [asyncio.create_task(executor.run(release.wait)) for _ in range(5)]
+    await asyncio.sleep(0.05)
+    assert executor.pending['inference'] == 5
+
+    with pytest.raises(Overloaded):
+      await executor.run(release.wait)
+
+    release.set()
+    assert await asyncio.gather(*tasks) == [True] * 5
+    return executor.pending['inference']
+
+  try:
+    assert asyncio.run(jobs()) == 0
+  finally:
+    release.set()
+    executor.stop()
@@ -0,0 +1,21 @@
+from src.services.nutrition_cache import NutritionCache
+from src.services.metrics_srv import REGISTRY
+
+
+def lookups(result):
+  return REGISTRY.get_sample_value('smartbite_cache_lookups_total', {'cache': 'nutrition', 'result': result}) or 0.0
+
+
+def test_stale_lookup_is_counted_once():
+  """test that an expired entry is returned flagged as stale and counted only as a stale hit, not also as a miss"""
+  cache = NutritionCache()
+  cache.set('Pizza', {'calories': '250kcal'})
+  expires_at, scores = cache._entries['Pizza']
+  cache._entries['Pizza'] = (expires_at - cache.ttl - 1, scores)
+  before = {result: lookups(result) for result in ('hit', 'stale_hit', 'miss')}
+
+  assert cache.get('Pizza') == ({'calories': '250kcal'}, True)
+  assert cache.get('Sushi') == (None, False)
+
+  after = {result: lookups(result) for result in ('hit', 'stale_hit', 'miss')}
+  assert {result: after[result] - before[result] for result in after} == {'hit': 0, 'stale_hit': 1, 'miss': 1}
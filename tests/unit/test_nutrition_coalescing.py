@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('httpx')
+pytest.importorskip('oauthlib')
+
+from src.services import nutrition_srv  # noqa: E402
+from src.services.nutrition_cache import NutritionCache  # noqa: E402
+from src.services.metrics_srv import REGISTRY  # noqa: E402
+
+
+def test_concurrent_lookups_share_one_call(monkeypatch):
+  """test that concurrent lookups of the same label wait for a single nutrition API call"""
+  calls = []
+
+  async def fetch(label):
+    calls.append(label)
+    await asyncio.sleep(0.05)
+    return {'calories': '250kcal', 'label': label}
+
+  monkeypatch.setattr(nutrition_srv, '_fetch_nutrition_scores', fetch)
+  monkeypatch.setattr(NutritionCache, '_instance', None)
+  coalesced = REGISTRY.get_sample_value('smartbite_nutrition_coalesced_total')
+
+  async def lookups():
+    return await asyncio.gather(*[nutrition_srv.get_nutrition_scores(label) for label in ['Pizza'] * 5 + ['Sushi'] * 3])
+
+  results = asyncio.run(lookups())
+
+  assert sorted(calls) == ['Pizza', 'Sushi']
+  assert [r['label'] for r in results] == ['Pizza'] * 5 + ['Sushi'] * 3
+  assert REGISTRY.get_sample_value('smartbite_nutrition_coalesced_total') - coalesced == 6
+  assert not nutrition_srv.inflight